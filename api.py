@@ -0,0 +1,284 @@
+"""
+AstroPulse HTTP/JSON API (asyncio, aiohttp).
+
+Serves the same calculations as the Streamlit UI to other clients (mobile app):
+    POST /natal            natal positions and house cusps
+    POST /transits         transit intervals
+    POST /pulse            Energy Pulse series
+    POST /interpretations  transit intervals with interpretation texts
+    POST /lifetime         Jupiter..Pluto transits over a lifetime
+    POST /group            intervals + pulse per chart and a group pulse ("charts": list of natal records)
+    GET  /health
+    GET  /metrics          Prometheus text format (start with --metrics)
+
+With --allow-profile, any POST accepts ?profile=1: the calculation is profiled in its
+worker and the report is returned in the "profile" field (bypasses the result cache,
+so it is off by default; without the flag ?profile=1 is answered with 403).
+
+Request body: a natal record as in batch.py (date, time, tz, lat, lon + optional
+start, end, orb, planets, points, aspects, method, resolution, sampling, lang). /group takes
+the shared settings at the top level and the natal fields (id, date, time, tz, lat, lon, hsys)
+per chart.
+
+CPU-bound ephemeris work runs in a process pool; identical in-flight requests are
+coalesced onto one computation and finished results are kept in an LRU cache
+(cleared when scoring.json changes). The cache key holds the resolved window, so a
+request without start/end is a new key every day.
+
+Usage:
+    python api.py --port 8080 --workers 4
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import swisseph as swe
+from aiohttp import web
+
+import batch
+import engine
+import metrics
+import scoring
+from interpretations import get_interpretation, get_planet_rarity
+
+ENDPOINTS = ("natal", "transits", "pulse", "interpretations", "lifetime", "group")
+REQUIRED_FIELDS = {"group": ("charts",)}
+NATAL_FIELDS = ("id", "date", "time", "tz", "lat", "lon", "hsys")
+WINDOW_KINDS = ("transits", "pulse", "interpretations", "group")
+# Errors of calculations on bad input (the record itself is validated by resolve_request);
+# anything else is a server error (500)
+BAD_INPUT_ERRORS = (ValueError, swe.Error)
+
+
+def request_defaults():
+    today = datetime.date.today()
+    return {"start": today, "end": today + datetime.timedelta(days=30), "method": "scan", "resolution": 4}
+
+
+def group_members(record):
+    """/group body -> one natal record per chart (shared settings + the chart's natal fields)."""
+    shared = {k: v for k, v in record.items() if k != "charts" and k not in NATAL_FIELDS}
+    return [dict(shared, **{k: m[k] for k in NATAL_FIELDS if k in m}) for m in record["charts"]]
+
+
+def resolve_request(kind, record):
+    """
+    Validates the record (batch.parse_record, any error is a bad request) and pins the
+    default window to today's dates, so the cache key names the window actually computed.
+    """
+    members = group_members(record) if kind == "group" else [record]
+    if not members:
+        raise ValueError("charts must not be empty")
+    cfg = [batch.parse_record(m, request_defaults()) for m in members][0]
+    if kind in WINDOW_KINDS:
+        record = dict(record, start=cfg["start"].isoformat(), end=cfg["end"].isoformat())
+    return record
+
+
+# -------------------------------------
+# Worker side (runs in the process pool)
+# -------------------------------------
+def compute(kind, record):
+    """One API calculation; record is the parsed JSON body."""
+    defaults = request_defaults()
+    if kind == "group":
+        return compute_group(record, defaults)
+    cfg = batch.parse_record(record, defaults)
+    natal = engine.calculate_natal_chart(cfg["birth_utc"], cfg["lat"], cfg["lon"], cfg["chart_points"], cfg["hsys"])
+    if kind == "natal":
+        return batch.natal_to_json(natal)
+    if kind == "lifetime":
+        df = engine.calculate_lifetime_transits(cfg["birth_utc"], natal.positions, natal.cusps,
+                                                years=float(record.get("years") or 90),
+                                                aspect_names=cfg["aspects"], orb=cfg["orb"])
+        return {"transits": batch.lifetime_to_json(df)}
+
+    table = engine.calculate_transit_table(cfg["start"], cfg["end"], 1, natal.positions, cfg["planets"],
+                                           cfg["aspects"], cfg["orb"], natal.cusps, method=cfg["method"],
+                                           natal_points=cfg["points"])
+    if kind == "pulse":
+        pulse_idx, pulse = engine.calculate_pulse(table, natal.positions, cfg["orb"], cfg["start"], cfg["end"],
+                                                  cfg["resolution"], sampling=cfg["sampling"])
+        return batch.pulse_to_json(pulse_idx, pulse)
+
+    transits = batch.transits_to_json(table)
+    if kind == "interpretations":
+        lang = record.get("lang", "ru")
+        for row, score in zip(transits, table.scores().tolist()):
+            row["score"] = score
+            row["text"] = get_interpretation(row["transiting"], row["aspect"], row["natal"],
+                                             row["t_house"], row["n_house"], lang=lang)
+            row["rarity"] = get_planet_rarity(row["transiting"], lang=lang)
+    return {"transits": transits}
+
+
+def compute_group(record, defaults):
+    """Several natal charts over one window: one shared transit scan (engine.calculate_group_transits)."""
+    members = group_members(record)
+    cfgs = [batch.parse_record(m, defaults) for m in members]
+    if not cfgs:
+        raise ValueError("charts must not be empty")
+    cfg = cfgs[0]
+    natals = [engine.calculate_natal_chart(c["birth_utc"], c["lat"], c["lon"], cfg["chart_points"], c["hsys"])
+              for c in cfgs]
+    group = engine.calculate_group_transits(cfg["start"], cfg["end"], 1, natals, cfg["planets"], cfg["aspects"],
+                                            cfg["orb"], cfg["resolution"], natal_points=cfg["points"],
+                                            pulse_sampling=cfg["sampling"])
+    charts = [dict({"id": str(m.get("id", i))}, **batch.natal_to_json(natal), transits=batch.transits_to_json(table),
+                   pulse=batch.pulse_to_json(group.pulse_idx, pulse))
+              for i, (m, natal, table, pulse) in enumerate(zip(members, natals, group.intervals, group.pulses))]
+    return {"charts": charts, "group_pulse": batch.pulse_to_json(group.pulse_idx, group.group_pulse)}
+
+
+def run_job(kind, record, profile=False):
+    """
+    compute() + the worker's metrics since the last job + optional profile report + the
+    stamp of the scoring config the result was scored with.
+    """
+    stamp = scoring.get_model().stamp
+    with metrics.profile(profile) as report:
+        result = compute(kind, record)
+    return result, metrics.drain() if metrics.enabled() else None, report.text, stamp
+
+
+def init_worker(ephemeris_path, metrics_enabled=False):
+    batch.init_worker(ephemeris_path)
+    if metrics_enabled:
+        metrics.enable()
+
+
+# -------------------------------------
+# Server side
+# -------------------------------------
+class ForecastService:
+    """Coalesces identical in-flight requests and caches finished results (LRU)."""
+
+    def __init__(self, pool, cache_size=1024):
+        self.pool = pool
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self.hits = self.misses = self.coalesced = 0
+
+    async def _run(self, kind, record, profile=False):
+        result, snapshot, report, stamp = await asyncio.get_running_loop().run_in_executor(
+            self.pool, run_job, kind, record, profile)
+        if snapshot:
+            metrics.merge(snapshot)
+        return result, report, stamp
+
+    async def get(self, kind, record, profile=False):
+        if profile:
+            result, report, _ = await self._run(kind, record, profile=True)
+            return dict(result, profile=report)
+        model = scoring.get_model()  # an edited scoring.json clears the cache (on_reload in create_app)
+        key = kind + json.dumps(record, sort_keys=True, separators=(",", ":"))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key]
+        if key in self._in_flight:
+            self.coalesced += 1
+            return (await asyncio.shield(self._in_flight[key]))[0]
+
+        self.misses += 1
+        fut = asyncio.ensure_future(self._run(kind, record))
+        self._in_flight[key] = fut
+        try:
+            result, _, stamp = await asyncio.shield(fut)
+        finally:
+            self._in_flight.pop(key, None)
+        # A worker checks scoring.json on its own clock: a result scored with another config
+        # than this process's current one is returned but not cached
+        if stamp != model.stamp or model is not scoring.get_model():
+            return result
+        self._cache[key] = result
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+
+def make_handler(kind):
+    async def handler(request):
+        try:
+            record = await request.json()
+        except ValueError:
+            return web.json_response({"error": "Body must be JSON"}, status=400)
+        required = REQUIRED_FIELDS.get(kind, ("date", "lat", "lon"))
+        if not isinstance(record, dict) or not all(k in record for k in required):
+            return web.json_response({"error": f"Required fields: {', '.join(required)}"}, status=400)
+        profile = request.query.get("profile") == "1"
+        if profile and not request.app["allow_profile"]:
+            return web.json_response({"error": "Profiling is disabled (start the API with --allow-profile)"},
+                                     status=403)
+        try:
+            record = resolve_request(kind, record)
+        except Exception as e:  # parsing only touches the request body
+            return web.json_response({"error": f"{type(e).__name__}: {e}"}, status=400)
+        try:
+            with metrics.span(f"api_{kind}"):
+                result = await request.app["service"].get(kind, record, profile)
+        except BAD_INPUT_ERRORS as e:
+            return web.json_response({"error": f"{type(e).__name__}: {e}"}, status=400)
+        return web.json_response(result)
+    return handler
+
+
+async def health(request):
+    service = request.app["service"]
+    return web.json_response({"status": "ok", "scoring_version": scoring.get_model().version, "cache": {
+        "size": len(service._cache), "hits": service.hits, "misses": service.misses,
+        "coalesced": service.coalesced, "in_flight": len(service._in_flight)}})
+
+
+async def metrics_endpoint(request):
+    return web.Response(text=metrics.render_prometheus(), content_type="text/plain",
+                        headers={"X-Prometheus-Format": "0.0.4"})
+
+
+def create_app(workers=None, cache_size=1024, ephemeris_path=engine.EPHEMERIS_PATH, allow_profile=False):
+    app = web.Application()
+    app["allow_profile"] = allow_profile
+    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                               initializer=init_worker, initargs=(ephemeris_path, metrics.enabled()))
+    service = app["service"] = ForecastService(pool, cache_size)
+    # Cached results carry scores: drop them when the scoring config changes (workers reload on their own)
+    scoring.on_reload(lambda model: service._cache.clear())
+    metrics.register_collector(lambda: {"api_cache": {
+        "size": len(service._cache), "hits": service.hits, "misses": service.misses,
+        "coalesced": service.coalesced, "in_flight": len(service._in_flight)}})
+
+    async def shutdown(app):
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    app.on_cleanup.append(shutdown)
+    for kind in ENDPOINTS:
+        app.router.add_post(f"/{kind}", make_handler(kind))
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_endpoint)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AstroPulse HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=0, help="process count (default: CPU cores)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="LRU result entries")
+    parser.add_argument("--ephemeris-path", default=engine.EPHEMERIS_PATH)
+    parser.add_argument("--metrics", action="store_true", help="enable counters/spans for GET /metrics")
+    parser.add_argument("--allow-profile", action="store_true",
+                        help="accept ?profile=1 (uncached profiled recomputation) from clients")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    web.run_app(create_app(args.workers, args.cache_size, args.ephemeris_path, args.allow_profile),
+                host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
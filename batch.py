@@ -0,0 +1,428 @@
+"""
+Batch forecast runner.
+
+Reads natal records from CSV or JSONL and computes transits + Energy Pulse for each
+of them in a process pool. Results are streamed to JSONL (one line per chart) or to
+Parquet part files, with a checkpoint file so an interrupted run can be resumed.
+
+Record fields (CSV header / JSON keys):
+    id, date (YYYY-MM-DD), time (HH:MM), tz, lat, lon
+    optional: start, end (YYYY-MM-DD), orb, planets, points, aspects, method, resolution,
+              sampling (pulse: grid / adaptive), hsys (swisseph house system letter, default P)
+    (planets/points/aspects: JSON list or comma separated names; planets are the transiting
+    bodies, points the natal points incl. Ascendant, MC, North Node - default: the planets)
+
+Usage:
+    python batch.py subscribers.csv -o forecasts.jsonl --start 2026-01-01 --end 2026-12-31
+    python batch.py subscribers.jsonl -o out_dir --format parquet --workers 8
+    python batch.py subscribers.csv -o forecasts.jsonl --resume
+    python batch.py subscribers.csv -o forecasts.jsonl --resume --retry-errors
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+import pytz
+
+import engine
+
+DEFAULT_PLANETS = ["Sun", "Mars", "Jupiter", "Saturn", "Pluto"]
+DEFAULT_ASPECTS = ["Conjunction", "Square", "Trine", "Opposition"]
+DEFAULT_ORB = 3.0
+PARQUET_PREFIXES = ("transits", "pulse", "errors")
+
+
+# -------------------------------------
+# Input
+# -------------------------------------
+def read_records(path):
+    """Yields natal records one by one (CSV or JSONL by extension)."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for i, row in enumerate(csv.DictReader(f)):
+                row.setdefault("id", str(i))
+                yield row
+        else:
+            for i, line in enumerate(f):
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    row.setdefault("id", str(i))
+                    yield row
+
+
+def _name_list(value, default):
+    if value is None or value == "":
+        return list(default)
+    if isinstance(value, list):
+        return value
+    value = value.strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _date(value):
+    return value if isinstance(value, datetime.date) else datetime.date.fromisoformat(str(value))
+
+
+# -------------------------------------
+# Worker
+# -------------------------------------
+def init_worker(ephemeris_path):
+    """Each worker process keeps its own swisseph state."""
+    engine.set_ephemeris_path(ephemeris_path)
+
+
+def parse_record(record, defaults):
+    """Natal record (strings or JSON values) -> typed calculation settings."""
+    b_date = _date(record["date"])
+    bt_h, bt_m = map(int, str(record.get("time") or "12:00").split(':'))
+    tz = pytz.timezone(record.get("tz") or "UTC")
+    local_birth = tz.localize(datetime.datetime(b_date.year, b_date.month, b_date.day, bt_h, bt_m))
+
+    planets = engine.resolve_points(_name_list(record.get("planets"), DEFAULT_PLANETS), transiting=True)
+    points = engine.resolve_points(_name_list(record.get("points"), [name for _, name in planets]))
+    return {
+        "birth_utc": local_birth.astimezone(pytz.UTC),
+        "lat": float(record["lat"]), "lon": float(record["lon"]),
+        "planets": planets,
+        "points": points,
+        "chart_points": [p for p in engine.ALL_POINTS if p in planets or p in points],
+        "aspects": _name_list(record.get("aspects"), DEFAULT_ASPECTS),
+        "orb": float(record.get("orb") or DEFAULT_ORB),
+        "start": _date(record.get("start") or defaults["start"]),
+        "end": _date(record.get("end") or defaults["end"]),
+        "resolution": float(record.get("resolution") or defaults["resolution"]),
+        "sampling": record.get("sampling") or defaults.get("sampling", "grid"),
+        "method": record.get("method") or defaults["method"],
+        "hsys": str(record.get("hsys") or "P").encode(),
+    }
+
+
+def natal_to_json(natal):
+    names = dict(engine.ALL_POINTS)
+    return {
+        "natal": {names[pid]: round(lon, 6) for pid, lon in natal.positions.items()},
+        "cusps": [round(c, 6) for c in natal.cusps],
+    }
+
+
+def _iso(ns):
+    return [None if v == engine.NAT_NS else t.isoformat() for v, t in zip(ns.tolist(), pd.to_datetime(ns, utc=True))]
+
+
+def transits_to_json(intervals):
+    """JSON rows of an IntervalTable (or transit DataFrame), built column-wise."""
+    table = intervals if isinstance(intervals, engine.IntervalTable) else engine.IntervalTable.from_frame(intervals)
+    columns = {
+        "aspect": [engine.ASPECT_NAMES[c] for c in table.aspect.tolist()],
+        "transiting": [engine.POINT_NAMES[c] for c in table.transiting.tolist()],
+        "natal": [engine.POINT_NAMES[c] for c in table.natal.tolist()],
+        "start": _iso(table.start), "end": _iso(table.end),
+        "t_house": table.t_house.tolist(), "n_house": table.n_house.tolist(),
+        "t_houses": [list(h) for h in table.t_houses()],
+    }
+    if table.exact is not None:
+        columns["exact"] = _iso(table.exact)
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def lifetime_to_json(df):
+    """transits_to_json plus every exact hit of the grouped passes."""
+    transits = transits_to_json(df)
+    for row, hits in zip(transits, df["exacts"]):
+        row["exacts"] = [t.isoformat() for t in hits]
+    return transits
+
+
+def pulse_to_json(pulse_idx, pulse):
+    return {"t": [t.isoformat() for t in pulse_idx], "score": [round(float(v), 4) for v in pulse]}
+
+
+def forecast_record(record, defaults):
+    """Computes natal chart, transit intervals and pulse series for one record."""
+    rid = str(record["id"])
+    try:
+        cfg = parse_record(record, defaults)
+        natal = engine.calculate_natal_chart(cfg["birth_utc"], cfg["lat"], cfg["lon"], cfg["chart_points"],
+                                             cfg["hsys"])
+        table = engine.calculate_transit_table(cfg["start"], cfg["end"], 1, natal.positions, cfg["planets"],
+                                               cfg["aspects"], cfg["orb"], natal.cusps, method=cfg["method"],
+                                               natal_points=cfg["points"])
+        pulse_idx, pulse = engine.calculate_pulse(table, natal.positions, cfg["orb"], cfg["start"], cfg["end"],
+                                                  cfg["resolution"], sampling=cfg["sampling"])
+    except Exception as e:
+        return {"id": rid, "error": f"{type(e).__name__}: {e}"}
+
+    return dict({"id": rid}, **natal_to_json(natal), transits=transits_to_json(table),
+                pulse=pulse_to_json(pulse_idx, pulse))
+
+
+# -------------------------------------
+# Output
+# -------------------------------------
+def _truncate_torn_line(path, block=1 << 16):
+    """Cuts a file after its last newline (the torn last line of an interrupted run)."""
+    with open(path, "rb+") as f:
+        pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            nl = f.read(pos - start).rfind(b"\n")
+            if nl >= 0:
+                f.truncate(start + nl + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+
+def resume_jsonl(path, retry_errors=False):
+    """
+    Prepares a JSONL output for appending: cuts off a torn last line and, with retry_errors,
+    removes the error lines. Returns (ids in the file, error ids).
+    """
+    ids, error_ids = set(), set()
+    if not os.path.isfile(path):
+        return ids, error_ids
+    _truncate_torn_line(path)
+    kept = open(path + ".tmp", "w", encoding="utf-8") if retry_errors else None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            res = json.loads(line)
+            if "error" in res:
+                error_ids.add(str(res["id"]))
+            else:
+                ids.add(str(res["id"]))
+                if kept:
+                    kept.write(line)
+    if kept:
+        kept.close()
+        os.replace(path + ".tmp", path)
+    return ids, error_ids
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.f = open(path, "a", encoding="utf-8")
+
+    def write(self, results):
+        for res in results:
+            self.f.write(json.dumps(res, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSink:
+    """Writes transits/pulse/errors as numbered part files in an output directory."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow: pip install pyarrow")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        # Continue numbering after existing parts (resume)
+        self.part = max(self._parts(), default=-1) + 1
+
+    def _parts(self, prefixes=PARQUET_PREFIXES):
+        """{part number: [file names]} of the existing part files."""
+        parts = {}
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith(".parquet") and name.split("-")[0] in prefixes:
+                parts.setdefault(int(name.rsplit("-", 1)[1].split(".")[0]), []).append(name)
+        return parts
+
+    def _ids(self, names):
+        return {str(i) for name in names
+                for i in self.pq.read_table(os.path.join(self.path, name), columns=["id"]).column("id").to_pylist()}
+
+    def _part_ids(self, names):
+        """(ids in the readable files, all files readable) of one part."""
+        ids, readable = set(), True
+        for name in names:
+            try:
+                ids |= self._ids([name])
+            except (self.pa.ArrowException, OSError):
+                readable = False  # torn part file (written by a version without atomic parts)
+        return ids, readable
+
+    def resume(self, done, retry_errors=False):
+        """
+        Prepares the directory for a resumed run and returns the error ids (removed when
+        retry_errors). The checkpoint follows the part files, so only the last part can hold
+        ids missing from it (a crash in between) or be unreadable: that part is deleted and
+        its ids are dropped from done (updated in place) to be recomputed.
+        """
+        for name in os.listdir(self.path):
+            if name.endswith(".parquet.tmp"):
+                os.remove(os.path.join(self.path, name))  # part write interrupted by a crash
+        parts = self._parts()
+        ids, readable = self._part_ids(parts[max(parts)]) if parts else (set(), True)
+        if not (readable and ids <= done):
+            done -= ids
+            for name in parts.pop(max(parts)):
+                os.remove(os.path.join(self.path, name))
+            self.part = max(parts, default=-1) + 1
+        error_parts = [name for names in self._parts(("errors",)).values() for name in names]
+        error_ids = self._ids(error_parts)
+        if retry_errors:
+            for name in error_parts:
+                os.remove(os.path.join(self.path, name))
+        return error_ids
+
+    def _write_table(self, prefix, rows):
+        if rows:
+            # Atomic write: a crash never leaves a torn part file under the final name
+            path = os.path.join(self.path, f"{prefix}-{self.part:05d}.parquet")
+            self.pq.write_table(self.pa.Table.from_pylist(rows), path + ".tmp")
+            os.replace(path + ".tmp", path)
+
+    def write(self, results):
+        transits, pulse, errors = [], [], []
+        for res in results:
+            if "error" in res:
+                errors.append(res)
+                continue
+            transits.extend(dict(t, id=res["id"]) for t in res["transits"])
+            pulse.extend({"id": res["id"], "t": t, "score": v} for t, v in zip(res["pulse"]["t"], res["pulse"]["score"]))
+        self._write_table("transits", transits)
+        self._write_table("pulse", pulse)
+        self._write_table("errors", errors)
+        self.part += 1
+
+    def close(self):
+        pass
+
+
+# -------------------------------------
+# Runner
+# -------------------------------------
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def run(args):
+    checkpoint_path = args.checkpoint or f"{args.output.rstrip('/')}.checkpoint"
+    if not args.resume:
+        for path in (checkpoint_path, args.output):
+            if os.path.isfile(path):
+                os.remove(path)
+        if os.path.isdir(args.output):
+            for name in os.listdir(args.output):
+                if name.endswith(".parquet") and name.split("-")[0] in PARQUET_PREFIXES:
+                    os.remove(os.path.join(args.output, name))
+
+    total = sum(1 for _ in read_records(args.input))
+    defaults = {"start": args.start, "end": args.end, "method": args.method, "resolution": args.resolution,
+                "sampling": args.sampling}
+    workers = args.workers or os.cpu_count() or 1
+    sink = ParquetSink(args.output) if args.format == "parquet" else None
+    done = set()
+    if args.resume:
+        done = load_checkpoint(checkpoint_path)
+        if sink is None:
+            # Lines written before the checkpoint was updated count as done
+            ids, error_ids = resume_jsonl(args.output, args.retry_errors)
+            done |= ids | error_ids
+        else:
+            error_ids = sink.resume(done, args.retry_errors)
+        if args.retry_errors:
+            done -= error_ids
+    if sink is None:
+        sink = JsonlSink(args.output)
+
+    processed = skipped = errors = 0
+    pending_out = []
+    t0 = last_report = time.time()
+
+    def report(final=False):
+        elapsed = time.time() - t0
+        rate = processed / elapsed if elapsed else 0.0
+        left = total - skipped - processed
+        eta = f"{left / rate:.0f}s" if rate else "-"
+        print(f"\r{processed + skipped}/{total} charts ({errors} errors) {rate:.1f}/s ETA {eta}",
+              end="\n" if final else "", file=sys.stderr, flush=True)
+
+    with open(checkpoint_path, "a", encoding="utf-8") as ckpt, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                initargs=(args.ephemeris_path,)) as pool:
+
+        def flush():
+            # Output first, then checkpoint: a crash in between only causes re-computation
+            sink.write(pending_out)
+            ckpt.write("".join(res["id"] + "\n" for res in pending_out))
+            ckpt.flush()
+            pending_out.clear()
+
+        in_flight = set()
+        max_in_flight = workers * 4  # bounded memory: never read far ahead of the pool
+        for record in read_records(args.input):
+            if str(record["id"]) in done:
+                skipped += 1
+                continue
+            in_flight.add(pool.submit(forecast_record, record, defaults))
+            while len(in_flight) >= max_in_flight:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    res = fut.result()
+                    errors += "error" in res
+                    processed += 1
+                    pending_out.append(res)
+                if len(pending_out) >= args.flush_every:
+                    flush()
+                if time.time() - last_report > 1:
+                    report()
+                    last_report = time.time()
+
+        for fut in in_flight:
+            res = fut.result()
+            errors += "error" in res
+            processed += 1
+            pending_out.append(res)
+        flush()
+    sink.close()
+    report(final=True)
+    return errors
+
+
+def main(argv=None):
+    today = datetime.date.today()
+    parser = argparse.ArgumentParser(description="AstroPulse batch forecast runner")
+    parser.add_argument("input", help="natal records (.csv or .jsonl)")
+    parser.add_argument("-o", "--output", required=True, help="output .jsonl file or parquet directory")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--start", type=_date, default=today, help="forecast start (default: today)")
+    parser.add_argument("--end", type=_date, default=today + datetime.timedelta(days=30),
+                        help="forecast end (default: today + 30 days)")
+    parser.add_argument("--method", choices=["scan", "roots", "index"], default="scan")
+    parser.add_argument("--resolution", type=float, default=4, help="pulse step in hours")
+    parser.add_argument("--sampling", choices=["grid", "adaptive"], default="grid",
+                        help="pulse samples: fixed grid or adaptive (exact times, no fixed step)")
+    parser.add_argument("--workers", type=int, default=0, help="process count (default: CPU cores)")
+    parser.add_argument("--flush-every", type=int, default=100, help="charts per output flush/checkpoint")
+    parser.add_argument("--resume", action="store_true", help="skip ids listed in the checkpoint")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="with --resume: recompute records that failed (their error output is removed)")
+    parser.add_argument("--checkpoint", help="checkpoint path (default: <output>.checkpoint)")
+    parser.add_argument("--ephemeris-path", default=engine.EPHEMERIS_PATH)
+    args = parser.parse_args(argv)
+    return 1 if run(args) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Performance benchmarks with JSON baselines.
+
+Every scenario runs in a fresh subprocess (so peak RSS belongs to that scenario):
+    cold_s         first run with empty ephemeris/transit caches
+    warm_s         median of --repeat runs on warm caches (warm_min_s: best run)
+    calc_ut_calls  swe.calc_ut calls of a cold run (houses_calls: swe.houses)
+    peak_rss_mb    peak resident set size of the scenario process
+    alloc_peak_mb  peak Python allocations of a warm run (tracemalloc)
+
+Usage:
+    python bench.py                                   # all scenarios
+    python bench.py -s year_all -s decade_slow        # selected scenarios
+    python bench.py --save-baseline benchmarks/baseline.json
+    python bench.py --baseline benchmarks/baseline.json   # exit 1 on regression
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+import batch
+import engine
+import metrics
+from ephemeris_cache import get_cache
+from interpretations import get_interpretation
+from transit_cache import get_transit_cache
+
+BIRTH_UTC = datetime.datetime(1988, 10, 18, 7, 25, tzinfo=datetime.timezone.utc)
+START = datetime.date(2026, 1, 1)
+DEFAULT_PLANETS = [p for p in engine.ALL_PLANETS if p[1] in batch.DEFAULT_PLANETS]
+SLOW_PLANETS = [p for p in engine.ALL_PLANETS if p[1] in ("Jupiter", "Saturn", "Uranus", "Neptune", "Pluto")]
+NODE_BODIES = engine.ALL_PLANETS + [p for p in engine.EXTRA_BODIES if p[1] == "North Node"]
+NATAL_POINTS = NODE_BODIES + engine.ANGLES
+
+# Relative increase that counts as a regression; time metrics also need +5 ms absolute
+TOLERANCES = {"cold_s": 0.25, "warm_s": 0.25, "calc_ut_calls": 0.0, "houses_calls": 0.0,
+              "peak_rss_mb": 0.15, "alloc_peak_mb": 0.15}
+MIN_TIME_DELTA = 0.005
+
+
+# -------------------------------------
+# Scenarios: setup(args) -> callable run()
+# -------------------------------------
+def _forecast(planets, aspects, days, method="scan", orb=3.0, points=None, sampling="grid"):
+    def setup(args):
+        natal = engine.calculate_natal_chart(BIRTH_UTC, 55.75, 37.61, points or planets)
+        end = START + datetime.timedelta(days=days)
+
+        def run():
+            df = engine.calculate_transits(START, end, 1, natal.positions, planets, aspects, orb, natal.cusps,
+                                           method=method, natal_points=points)
+            engine.calculate_pulse(df, natal.positions, orb, START, end, 4, sampling=sampling)
+        return run
+    return setup
+
+
+def _batch(args):
+    rng = random.Random(0)
+    records = [{"id": str(i), "date": f"{rng.randint(1950, 2005)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "time": f"{rng.randint(0, 23)}:{rng.randint(0, 59):02d}", "tz": "UTC",
+                "lat": rng.uniform(-60, 60), "lon": rng.uniform(-180, 180)} for i in range(args.charts)]
+    defaults = {"start": START, "end": START + datetime.timedelta(days=30), "method": "scan", "resolution": 4}
+
+    def run():
+        for record in records:
+            res = batch.forecast_record(record, defaults)
+            if "error" in res:
+                raise RuntimeError(res["error"])
+    return run
+
+
+def _lifetime(args):
+    natal = engine.calculate_natal_chart(BIRTH_UTC, 55.75, 37.61)
+
+    def run():
+        engine.calculate_lifetime_transits(BIRTH_UTC, natal.positions, natal.cusps, years=90)
+    return run
+
+
+def _group(args):
+    rng = random.Random(0)
+    charts = [engine.calculate_natal_chart(
+        datetime.datetime(rng.randint(1950, 2005), rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23),
+                          tzinfo=datetime.timezone.utc), rng.uniform(-60, 60), rng.uniform(-180, 180))
+        for _ in range(10)]
+    end = START + datetime.timedelta(days=365)
+
+    def run():
+        engine.calculate_group_transits(START, end, 1, charts, engine.ALL_PLANETS, list(engine.ASPECT_ANGLES), 2.0)
+    return run
+
+
+def _houses(args):
+    cusps = engine.calculate_natal_chart(BIRTH_UTC, 55.75, 37.61).cusps
+    positions = np.random.default_rng(0).uniform(0, 360, 10_000).tolist()
+
+    def run():
+        for pos in positions:
+            engine.get_house_for_pos(pos, cusps)
+    return run
+
+
+def _interpretations(args):
+    rng = random.Random(0)
+    names = [name for _, name in engine.ALL_PLANETS]
+    calls = [(rng.choice(names), rng.choice(list(engine.ASPECT_ANGLES)), rng.choice(names),
+              rng.randint(1, 12), rng.randint(1, 12), rng.choice(["ru", "en"])) for _ in range(1000)]
+
+    def run():
+        for t, a, n, th, nh, lang in calls:
+            get_interpretation(t, a, n, th, nh, lang=lang)
+    return run
+
+
+SCENARIOS = {
+    "default_30d": (_forecast(DEFAULT_PLANETS, batch.DEFAULT_ASPECTS, 30),
+                    "30 days, 5 planets, 4 aspects, transits + pulse"),
+    "year_all": (_forecast(engine.ALL_PLANETS, list(engine.ASPECT_ANGLES), 365),
+                 "1 year, 10 planets, 5 aspects, transits + pulse"),
+    "year_points": (_forecast(NODE_BODIES, list(engine.ASPECT_ANGLES), 365, points=NATAL_POINTS),
+                    "1 year, 10 planets + node to 13 natal points incl. ASC/MC, transits + pulse"),
+    "year_all_adaptive": (_forecast(engine.ALL_PLANETS, list(engine.ASPECT_ANGLES), 365, sampling="adaptive"),
+                          "1 year, 10 planets, 5 aspects, transits + adaptive pulse"),
+    "decade_slow": (_forecast(SLOW_PLANETS, list(engine.ASPECT_ANGLES), 3652),
+                    "10 years, Jupiter..Pluto, scan"),
+    "decade_slow_roots": (_forecast(SLOW_PLANETS, list(engine.ASPECT_ANGLES), 3652, method="roots"),
+                          "10 years, Jupiter..Pluto, root finding"),
+    "year_all_index": (_forecast(engine.ALL_PLANETS, list(engine.ASPECT_ANGLES), 365, method="index"),
+                       "1 year, 10 planets, 5 aspects, sky event index + pulse"),
+    "decade_slow_index": (_forecast(SLOW_PLANETS, list(engine.ASPECT_ANGLES), 3652, method="index"),
+                          "10 years, Jupiter..Pluto, sky event index"),
+    "lifetime_90y": (_lifetime, "90-year Jupiter..Pluto timeline to 10 natal points, 5 aspects"),
+    "group_10": (_group, "10 charts, 1 year, 10 planets, 5 aspects, one shared scan + pulses"),
+    "batch_1000": (_batch, "batch.forecast_record for --charts random charts (30 days)"),
+    "houses_10k": (_houses, "get_house_for_pos x 10,000"),
+    "interpretations_1k": (_interpretations, "get_interpretation x 1,000"),
+}
+
+
+# -------------------------------------
+# Measurement (inside the scenario subprocess)
+# -------------------------------------
+def _clear_caches():
+    get_cache().clear()
+    get_transit_cache().clear()
+    engine._house_index.cache_clear()
+    engine._lifetime_block.cache_clear()
+    engine._sky_block.cache_clear()
+
+
+def measure(name, args):
+    setup, _ = SCENARIOS[name]
+    run = setup(args)
+
+    _clear_caches()
+    metrics.enable()
+    metrics.reset()
+    run()
+    calls = {label: value for name, label, value in metrics.drain()["counters"] if name == "swe_calls_total"}
+    metrics.disable()
+    _clear_caches()
+    t0 = time.perf_counter()
+    run()
+    cold = time.perf_counter() - t0
+
+    times = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    run()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 2**20 if sys.platform == "darwin" else rss / 2**10  # bytes on macOS, KB on Linux
+    return {"cold_s": round(cold, 4), "warm_s": round(statistics.median(times), 4),
+            "warm_min_s": round(min(times), 4), "calc_ut_calls": calls.get("calc_ut", 0), "houses_calls": calls.get("houses", 0),
+            "peak_rss_mb": round(rss_mb, 1), "alloc_peak_mb": round(alloc_peak / 2**20, 2)}
+
+
+# -------------------------------------
+# Driver
+# -------------------------------------
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "pandas": pd.__version__, "swisseph": swe.version, "machine": platform.machine(),
+            "cpus": os.cpu_count()}
+
+
+def run_scenario(name, args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", name,
+           "--repeat", str(args.repeat), "--charts", str(args.charts)]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline):
+    """Regressions as (scenario, metric, baseline value, new value)."""
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base or "error" in metrics:
+            continue
+        for metric, tol in TOLERANCES.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            if metric.endswith("_s") and new - old < MIN_TIME_DELTA:
+                continue
+            if new > old * (1 + tol):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def print_table(results):
+    cols = ["cold_s", "warm_s", "calc_ut_calls", "houses_calls", "peak_rss_mb", "alloc_peak_mb"]
+    print(f"{'scenario':<20}" + "".join(f"{c:>15}" for c in cols))
+    for name, metrics in results.items():
+        if "error" in metrics:
+            print(f"{name:<20} ERROR {metrics['error']}")
+        else:
+            print(f"{name:<20}" + "".join(f"{metrics[c]:>15}" for c in cols))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AstroPulse benchmarks")
+    parser.add_argument("-s", "--scenario", action="append", choices=list(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="warm runs per scenario")
+    parser.add_argument("--charts", type=int, default=1000, help="charts in batch_1000")
+    parser.add_argument("-o", "--output", help="write results JSON")
+    parser.add_argument("--baseline", help="compare against a baseline JSON, exit 1 on regression")
+    parser.add_argument("--save-baseline", help="write results as the new baseline")
+    parser.add_argument("--list", action="store_true", help="list scenarios")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args)))
+        return 0
+    if args.list:
+        for name, (_, desc) in SCENARIOS.items():
+            print(f"{name:<20} {desc}")
+        return 0
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        print(f"running {name} ...", file=sys.stderr, flush=True)
+        results[name] = run_scenario(name, args)
+    print_table(results)
+
+    report = {"environment": environment(), "settings": {"repeat": args.repeat, "charts": args.charts},
+              "scenarios": results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+
+    status = 1 if any("error" in m for m in results.values()) else 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name}.{metric}: {old} -> {new} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+        if regressions:
+            status = 1
+        else:
+            print(f"no regressions against {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
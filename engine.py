@@ -0,0 +1,1725 @@
+"""
+AstroPulse calculation engine.
+
+Headless transit core: natal chart in, transit intervals and pulse series out.
+Has no Streamlit/Plotly dependency so it can be imported from workers,
+batch jobs and benchmarks (cold start is just swisseph + pandas).
+"""
+import bisect
+import datetime
+import functools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pytz
+import swisseph as swe
+
+import metrics
+import scoring
+from ephemeris_cache import GRID_ORIGIN_JD, compute_positions, get_cache
+
+# -------------------------------------
+# Constants
+# -------------------------------------
+# Ensure ephemeris path is absolute or correct relative to execution
+EPHEMERIS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ephemeris')
+
+ALL_PLANETS = [
+    (swe.SUN, "Sun"), (swe.MOON, "Moon"), (swe.MERCURY, "Mercury"),
+    (swe.VENUS, "Venus"), (swe.MARS, "Mars"), (swe.JUPITER, "Jupiter"),
+    (swe.SATURN, "Saturn"), (swe.URANUS, "Uranus"), (swe.NEPTUNE, "Neptune"),
+    (swe.PLUTO, "Pluto")
+]
+# Further transiting bodies. Chiron and the asteroids need the seas_*.se1 files in
+# ephemeris/ (swisseph has no Moshier fallback for them), see body_available
+EXTRA_BODIES = [
+    (swe.TRUE_NODE, "North Node"), (swe.CHIRON, "Chiron"), (swe.CERES, "Ceres"),
+    (swe.PALLAS, "Pallas"), (swe.JUNO, "Juno"), (swe.VESTA, "Vesta")
+]
+# Chart angles: natal points only, from swe.houses ascmc. Negative pseudo ids that are
+# never passed to swisseph
+ASCENDANT, MIDHEAVEN = -100, -101
+ANGLES = [(ASCENDANT, "Ascendant"), (MIDHEAVEN, "MC")]
+_ASCMC_INDEX = {ASCENDANT: 0, MIDHEAVEN: 1}
+
+# Points: transiting bodies and natal points are independent sets
+ALL_BODIES = ALL_PLANETS + EXTRA_BODIES
+ALL_POINTS = ALL_BODIES + ANGLES
+PLANET_IDS = {name: pid for pid, name in ALL_POINTS}
+_PLANET_NAMES = dict(ALL_POINTS)
+
+ASPECT_ANGLES = {"Conjunction": 0, "Sextile": 60, "Square": 90, "Trine": 120, "Opposition": 180}
+
+# Peak score weights (planet weight, rarity, conjunction / aspect nature) are tuned in
+# scoring.json, see scoring.py
+
+# Max. geocentric speed (deg/day) - sets adaptive step for root-finding mode
+MAX_DAILY_MOTION = {
+    "Moon": 15.4, "Mercury": 2.2, "Venus": 1.26, "Sun": 1.02,
+    "Mars": 0.8, "Jupiter": 0.25, "Saturn": 0.13, "Uranus": 0.07,
+    "Neptune": 0.04, "Pluto": 0.04,
+    "North Node": 0.26, "Chiron": 0.15, "Ceres": 0.5, "Pallas": 0.8, "Juno": 0.7, "Vesta": 0.55
+}
+MAX_ROOT_STEP_DAYS = 15.0
+
+# Lifetime mode: coarse swisseph step per slow planet (days); cubic interpolation between
+# samples stays within ~5e-3 deg of swisseph. Orb passes closer together than one synodic
+# period (retrograde loops) are grouped into one event.
+LIFETIME_PLANETS = ["Jupiter", "Saturn", "Uranus", "Neptune", "Pluto"]
+LIFETIME_STEP_DAYS = {"Jupiter": 24, "Saturn": 30, "Uranus": 32, "Neptune": 40, "Pluto": 40}
+SYNODIC_DAYS = {"Jupiter": 399, "Saturn": 378, "Uranus": 370, "Neptune": 368, "Pluto": 367}
+LIFETIME_SUBSTEPS = 24  # interpolated samples per coarse step inside candidate windows
+
+# Applying/separating trend: 1 +- TREND_AMPLITUDE, saturating once the orb changes faster
+# than TREND_RATE_FRACTION of the planet's max. daily motion (-> 1.0 at stations)
+TREND_AMPLITUDE = 0.2
+TREND_RATE_FRACTION = 0.1
+ROOT_TOLERANCE_DAYS = 1.0 / 86400  # 1 second
+
+# Sky event index: longitude runs per planet in blocks of SKY_BLOCK_DAYS, kept in an LRU.
+# Sample step (hours) per planet; times are refined on the cubic interpolant between samples
+SKY_BLOCK_DAYS = 360
+SKY_STEP_HOURS = {"Moon": 1, "Mercury": 2, "Venus": 3, "Mars": 4, "Sun": 6,
+                  "Jupiter": 12, "Saturn": 12, "Uranus": 24, "Neptune": 24, "Pluto": 24,
+                  "North Node": 6, "Chiron": 24, "Ceres": 6, "Pallas": 6, "Juno": 6, "Vesta": 6}
+SKY_INDEX_BLOCKS = int(os.environ.get("ASTROPULSE_SKY_INDEX_BLOCKS", 1024))
+
+# Adaptive pulse sampling: nodes at interval start / exact hits / end, segments bisected while
+# the score at the midpoint is more than PULSE_TOLERANCE x the largest peak score away
+# from the straight line (or the segment is longer than PULSE_MAX_STEP_HOURS)
+PULSE_TOLERANCE = 0.005
+PULSE_MIN_STEP_MINUTES = 10
+PULSE_MAX_STEP_HOURS = 48
+PULSE_MAX_ROUNDS = 20
+PULSE_NEWTON_ROUNDS = 8
+
+# Max. booleans per scan chunk of the (time x transit x natal x aspect) tensor
+SCAN_CHUNK_ELEMENTS = 2_000_000
+# Parallel scan (workers > 1): time shards of at least this many days, two per worker
+SCAN_SHARD_MIN_DAYS = 60
+
+JD_UNIX_EPOCH = 2440587.5  # 1970-01-01 00:00 UTC
+
+# House systems offered by swisseph (swe.houses hsys codes)
+HOUSE_SYSTEMS = {
+    b'P': "Placidus", b'K': "Koch", b'O': "Porphyry", b'R': "Regiomontanus",
+    b'C': "Campanus", b'E': "Equal", b'W': "Whole Sign", b'B': "Alcabitius",
+    b'M': "Morinus", b'T': "Polich/Page (Topocentric)", b'X': "Meridian",
+    b'A': "Equal (MC)", b'V': "Vehlow", b'H': "Horizontal",
+}
+
+# t_houses: transit houses visited while the aspect is active (ingresses), starting with t_house
+TRANSIT_COLUMNS = ["aspect", "transiting", "natal", "start", "end", "t_house", "n_house", "t_houses"]
+
+
+def set_ephemeris_path(path: str = EPHEMERIS_PATH) -> None:
+    """Points swisseph at the ephemeris data files (per process)."""
+    global _ephemeris_path
+    _ephemeris_path = path
+    swe.set_ephe_path(path)
+
+
+set_ephemeris_path()
+
+
+# -------------------------------------
+# Natal chart
+# -------------------------------------
+@dataclass
+class NatalChart:
+    """Natal positions (keyed by swisseph planet id) and house cusps."""
+    jd: float
+    positions: Dict[int, float]
+    cusps: Tuple[float, ...] = ()
+    ascmc: Tuple[float, ...] = ()
+    planets: List[Tuple[int, str]] = field(default_factory=lambda: list(ALL_PLANETS))
+    hsys: bytes = b'P'
+
+
+@metrics.timed("natal_chart")
+def calculate_natal_chart(birth_utc: datetime.datetime, lat: float, lon: float,
+                          planets: Sequence[Tuple[int, str]] = ALL_PLANETS,
+                          hsys: bytes = b'P') -> NatalChart:
+    """
+    Calculates natal point positions and house cusps.
+    swe.houses returns (cusps, ascmc); lat/lon must be floats.
+    planets: any ALL_POINTS entries; the angles are taken from ascmc.
+    """
+    if hsys not in HOUSE_SYSTEMS:
+        raise ValueError(f"Unknown house system: {hsys!r}")
+    jd = datetime_to_jd(birth_utc)
+    cusps, ascmc = swe.houses(jd, float(lat), float(lon), hsys)
+    positions = {pid: ascmc[_ASCMC_INDEX[pid]] if pid in _ASCMC_INDEX else get_planet_position(jd, pid)
+                 for pid, _ in planets}
+    return NatalChart(jd=jd, positions=positions, cusps=tuple(cusps), ascmc=tuple(ascmc), planets=list(planets),
+                      hsys=hsys)
+
+
+_body_available = {}  # (ephemeris path, body id) -> bool
+
+
+def body_available(pid: int) -> bool:
+    """True if swisseph can compute this body (Chiron/asteroids need their ephemeris files)."""
+    key = (_ephemeris_path, pid)
+    if key not in _body_available:
+        try:
+            available = pid not in _ASCMC_INDEX
+            if available:
+                swe.calc_ut(2451545.0, pid, swe.FLG_SWIEPH | swe.FLG_SPEED)
+        except swe.Error:
+            available = False
+        _body_available[key] = available
+    return _body_available[key]
+
+
+def resolve_points(names: Sequence[str], transiting: bool = False) -> List[Tuple[int, str]]:
+    """
+    (id, name) entries of ALL_POINTS for names, in catalog order. Transiting points must be
+    bodies that swisseph can compute here; unknown or unavailable names raise ValueError.
+    """
+    catalog = ALL_BODIES if transiting else ALL_POINTS
+    known = {name for _, name in catalog}
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        raise ValueError(f"Unknown {'transiting body' if transiting else 'point'}: {', '.join(unknown)}")
+    points = [p for p in catalog if p[1] in names]
+    missing = [name for pid, name in points if pid not in _ASCMC_INDEX and not body_available(pid)]
+    if missing:
+        raise ValueError(f"No ephemeris data for {', '.join(missing)} (seas_*.se1 files in {_ephemeris_path})")
+    return points
+
+
+# -------------------------------------
+# Low level helpers
+# -------------------------------------
+def datetime_to_jd(dt: datetime.datetime) -> float:
+    if dt.tzinfo is not None: dt = dt.astimezone(pytz.UTC)
+    return swe.julday(dt.year, dt.month, dt.day, dt.hour + dt.minute/60.0 + dt.second/3600.0, swe.GREG_CAL)
+
+
+def jd_to_datetime(jd: float) -> datetime.datetime:
+    """Inverse of datetime_to_jd (UTC, rounded to the second)."""
+    y, m, d, h = swe.revjul(jd, swe.GREG_CAL)
+    base = datetime.datetime(y, m, d, tzinfo=pytz.UTC)
+    return base + datetime.timedelta(seconds=round(h * 3600))
+
+
+def get_planet_position(jd: float, planet: int) -> float:
+    pos, _ = swe.calc_ut(jd, planet, swe.FLG_SWIEPH | swe.FLG_SPEED)
+    return pos[0]
+
+
+def get_planet_state(jd: float, planet: int) -> Tuple[float, float]:
+    """Longitude and longitude speed (deg/day, negative when retrograde)."""
+    pos, _ = swe.calc_ut(jd, planet, swe.FLG_SWIEPH | swe.FLG_SPEED)
+    return pos[0], pos[3]
+
+
+def angle_diff(a: float, b: float) -> float:
+    d = abs(a - b) % 360
+    return d if d <= 180 else 360 - d
+
+
+def is_aspect(diff: float, selected_aspects: Sequence[str], orb: float) -> Optional[str]:
+    for aspect_name in selected_aspects:
+        if abs(diff - ASPECT_ANGLES[aspect_name]) <= orb: return aspect_name
+    return None
+
+
+# -------------------------------------
+# Scoring
+# -------------------------------------
+def calculate_peak_score(transiting_name: str, aspect_name: str) -> float:
+    """Maximum potential score of an aspect (at exactness), from the scoring model's peak matrix."""
+    return float(peak_scores(point_code(transiting_name), aspect_code(aspect_name)))
+
+
+def orb_and_rate(t_lon, t_speed, n_pos, target_angle):
+    """
+    Current orb of an aspect and its time derivative (deg/day), from the transiting
+    longitude speed. rate < 0 means applying, rate > 0 separating. Works on arrays.
+    """
+    delta = (np.asarray(t_lon) - n_pos + 180.0) % 360.0 - 180.0
+    diff = np.abs(delta)
+    current_orb = np.abs(diff - target_angle)
+    rate = np.sign(diff - target_angle) * np.sign(delta) * t_speed
+    return current_orb, rate
+
+
+def trend_factor(rate, max_motion):
+    """Continuous applying (up to 1.2) / separating (down to 0.8) factor, 1.0 at stations."""
+    return 1.0 - TREND_AMPLITUDE * np.tanh(rate / (TREND_RATE_FRACTION * np.asarray(max_motion)))
+
+
+def get_dynamic_score(t: datetime.datetime, transiting_name: str, natal_name: str, aspect_name: str,
+                      natal_pos: Dict[int, float], orb_max: float) -> float:
+    """Calculates score at specific time t based on orb precision."""
+    jd = datetime_to_jd(t)
+    lon, spd = get_planet_positions([jd], [PLANET_IDS[transiting_name]])
+    n_pos_val = natal_pos[PLANET_IDS[natal_name]]
+
+    current_orb, rate = orb_and_rate(lon[0, 0], spd[0, 0], n_pos_val, ASPECT_ANGLES[aspect_name])
+    if current_orb > orb_max:
+        return 0
+
+    # Precision factor (1.0 at exact, 0.0 at max orb)
+    precision = 1.0 - (current_orb / orb_max)
+
+    # Applying vs Separating: sign of the orb derivative (no second ephemeris call)
+    trend = float(trend_factor(rate, MAX_DAILY_MOTION.get(transiting_name, 15.4)))
+
+    base_peak = calculate_peak_score(transiting_name, aspect_name)
+
+    # Final Formula: Peak * Precision^2 (sharper curves) * Trend
+    return base_peak * (precision ** 2) * trend
+
+
+# -------------------------------------
+# Houses
+# -------------------------------------
+class HouseIndex:
+    """
+    Per-chart house lookup built once from swe.houses cusps.
+    Cusps are rotated to start at the 1st house and unwrapped so they increase
+    monotonically; a longitude is then placed with bisect / np.searchsorted.
+    """
+
+    def __init__(self, cusps: Sequence[float]):
+        # swisseph returns 12 cusps (newer pyswisseph) or 13 with a dummy at index 0
+        cusps = list(cusps[1:13]) if len(cusps) > 12 else list(cusps[:12])
+        if len(cusps) != 12:
+            raise ValueError(f"Expected 12 house cusps, got {len(cusps)}")
+        # Some systems (Horizontal) number houses against the zodiac: mirror them
+        self.sign = -1 if (cusps[1] - cusps[0]) % 360 > 180 else 1
+        self.first = (self.sign * cusps[0]) % 360
+        self.bounds = np.array([self._unwrap(self.sign * c) for c in cusps])
+
+    def _unwrap(self, pos):
+        return self.first + (pos - self.first) % 360
+
+    def house_of(self, pos: float) -> int:
+        """House number (1-12) of one longitude."""
+        return bisect.bisect_right(self.bounds, self._unwrap(self.sign * pos))
+
+    def houses_of(self, positions) -> np.ndarray:
+        """Vectorized house_of for a whole longitude array (int8, same shape)."""
+        positions = np.asarray(positions, dtype=float)
+        return np.searchsorted(self.bounds, self._unwrap(self.sign * positions), side="right").astype(np.int8)
+
+
+@functools.lru_cache(maxsize=256)
+def _house_index(cusps: Tuple[float, ...]) -> HouseIndex:
+    return HouseIndex(cusps)
+
+
+def get_house_index(cusps: Sequence[float]) -> Optional[HouseIndex]:
+    """Cached HouseIndex for a cusps sequence (None when there are no cusps)."""
+    return _house_index(tuple(cusps)) if cusps else None
+
+
+def get_house_for_pos(pos: float, cusps: Sequence[float]) -> int:
+    """
+    Determines which house (1-12) a planet is in based on its longitude and house cusps.
+    Args:
+        pos (float): Planet longitude (0-360).
+        cusps (list): 12 cusps, or 13 with index 0 ignored (older swisseph returns 13 floats).
+    Returns:
+        int: House number (1-12).
+    """
+    return get_house_index(cusps).house_of(pos)
+
+
+def _append_houses(houses: List[int], seq) -> None:
+    """Appends the distinct consecutive houses of seq (ingresses) to houses."""
+    seq = np.asarray(seq)
+    if len(seq):
+        for h in seq[np.r_[True, seq[1:] != seq[:-1]]]:
+            if not houses or houses[-1] != h:
+                houses.append(int(h))
+
+
+# -------------------------------------
+# Interval table (struct of arrays)
+# -------------------------------------
+# Code -> name lists for IntervalTable columns. POINT_NAMES is append-only: the ten planets
+# keep codes 0-9, other points follow and unknown names get the next code via point_code().
+POINT_NAMES: List[str] = [name for _, name in ALL_POINTS]
+ASPECT_NAMES: List[str] = list(ASPECT_ANGLES)
+_POINT_CODES = {name: i for i, name in enumerate(POINT_NAMES)}
+_ASPECT_CODES = {name: i for i, name in enumerate(ASPECT_NAMES)}
+
+NAT_NS = np.iinfo(np.int64).min  # NaT as int64 nanoseconds
+
+
+def point_code(name: str) -> int:
+    code = _POINT_CODES.get(name)
+    if code is None:
+        if len(POINT_NAMES) > np.iinfo(np.int8).max:
+            raise ValueError("Too many point names for int8 codes")
+        code = _POINT_CODES[name] = len(POINT_NAMES)
+        POINT_NAMES.append(name)
+    return code
+
+
+def aspect_code(name: str) -> int:
+    return _ASPECT_CODES[name]
+
+
+_peak_table = (None, None)  # ((scoring revision, len(POINT_NAMES)), read-only peak matrix)
+
+
+def peak_score_table() -> np.ndarray:
+    """
+    Dense [point code, aspect code] peak scores of the current scoring model. Compiled once
+    per model revision (a reloaded scoring.json recompiles it) and POINT_NAMES length.
+    """
+    global _peak_table
+    model = scoring.get_model()
+    key = (model.revision, len(POINT_NAMES))
+    compiled_key, table = _peak_table
+    if compiled_key != key:
+        table = model.peak_matrix(POINT_NAMES, ASPECT_NAMES)
+        table.setflags(write=False)
+        _peak_table = (key, table)
+    return table
+
+
+def peak_scores(transiting, aspect) -> np.ndarray:
+    """Peak scores of point / aspect code arrays (one gather from peak_score_table)."""
+    return peak_score_table()[np.asarray(transiting, dtype=np.intp), np.asarray(aspect, dtype=np.intp)]
+
+
+def _codes(values, lookup) -> np.ndarray:
+    """int8 codes of a name column (categorical columns from to_frame() are remapped without string work)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        cat_codes = np.array([lookup(c) for c in values.cat.categories], dtype=np.int8)
+        return cat_codes[values.cat.codes.to_numpy()] if len(values) else np.zeros(0, np.int8)
+    return np.array([lookup(v) for v in values], dtype=np.int8)
+
+
+def _datetime_ns(values) -> np.ndarray:
+    return pd.DatetimeIndex(values).as_unit("ns").asi8
+
+
+@dataclass
+class IntervalTable:
+    """
+    Transit intervals as parallel arrays (one row per interval):
+    planet/aspect names as int8 codes into POINT_NAMES/ASPECT_NAMES, start/end/exact as
+    int64 ns since the Unix epoch (UTC), houses as int8. The transit houses visited
+    during each interval (t_houses) are stored flat with CSR offsets.
+    """
+    transiting: np.ndarray
+    natal: np.ndarray
+    aspect: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+    t_house: np.ndarray
+    n_house: np.ndarray
+    houses: np.ndarray                    # flat t_houses of all rows
+    houses_offsets: np.ndarray            # row i: houses[houses_offsets[i]:houses_offsets[i + 1]]
+    exact: Optional[np.ndarray] = None    # NAT_NS where the aspect does not perfect
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    @classmethod
+    def empty(cls, with_exact: bool = False) -> "IntervalTable":
+        return IntervalBuilder(with_exact).build()
+
+    @classmethod
+    def concat(cls, tables: Sequence["IntervalTable"]) -> "IntervalTable":
+        tables = [t for t in tables if len(t)] or list(tables[:1]) or [cls.empty()]
+        if len(tables) == 1:
+            return tables[0]
+        offsets = [tables[0].houses_offsets]
+        base = tables[0].houses_offsets[-1]
+        for t in tables[1:]:
+            offsets.append(t.houses_offsets[1:] + base)
+            base += t.houses_offsets[-1]
+        with_exact = all(t.exact is not None for t in tables)
+        return cls(*(np.concatenate([getattr(t, f) for t in tables])
+                     for f in ("transiting", "natal", "aspect", "start", "end", "t_house", "n_house", "houses")),
+                   houses_offsets=np.concatenate(offsets),
+                   exact=np.concatenate([t.exact for t in tables]) if with_exact else None)
+
+    def take(self, idx) -> "IntervalTable":
+        idx = np.asarray(idx, dtype=np.intp)
+        lengths = np.diff(self.houses_offsets)[idx]
+        flat = (np.repeat(self.houses_offsets[:-1][idx] - np.cumsum(lengths) + lengths, lengths)
+                + np.arange(lengths.sum()))
+        return IntervalTable(self.transiting[idx], self.natal[idx], self.aspect[idx], self.start[idx],
+                             self.end[idx], self.t_house[idx], self.n_house[idx], self.houses[flat],
+                             np.r_[0, np.cumsum(lengths)].astype(np.int32),
+                             None if self.exact is None else self.exact[idx])
+
+    def sorted(self) -> "IntervalTable":
+        """Ordered by start, then transiting, natal, aspect code."""
+        return self.take(np.lexsort((self.aspect, self.natal, self.transiting, self.start)))
+
+    # -- derived columns (computed on demand) --
+    def scores(self) -> np.ndarray:
+        return peak_scores(self.transiting, self.aspect)
+
+    def t_houses(self) -> List[Tuple[int, ...]]:
+        bounds = self.houses_offsets.tolist()
+        flat = self.houses.tolist()
+        return [tuple(flat[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def labels(self) -> List[str]:
+        """Display labels "<transiting> <aspect> <natal>"."""
+        return [f"{POINT_NAMES[t]} {ASPECT_NAMES[a]} {POINT_NAMES[n]}"
+                for t, a, n in zip(self.transiting.tolist(), self.aspect.tolist(), self.natal.tolist())]
+
+    # -- pandas interop --
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame with TRANSIT_COLUMNS (+ exact): names as categoricals, UTC datetimes."""
+        points = pd.CategoricalDtype(list(POINT_NAMES))
+        df = pd.DataFrame({
+            "aspect": pd.Categorical.from_codes(self.aspect, dtype=pd.CategoricalDtype(ASPECT_NAMES)),
+            "transiting": pd.Categorical.from_codes(self.transiting, dtype=points),
+            "natal": pd.Categorical.from_codes(self.natal, dtype=points),
+            "start": pd.to_datetime(self.start, utc=True),
+            "end": pd.to_datetime(self.end, utc=True),
+            "t_house": self.t_house,
+            "n_house": self.n_house,
+            "t_houses": self.t_houses(),
+        }, columns=TRANSIT_COLUMNS)
+        if self.exact is not None:
+            df["exact"] = pd.to_datetime(self.exact, utc=True)
+        return df
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "IntervalTable":
+        """Inverse of to_frame (also accepts plain string / datetime columns)."""
+        n = len(df)
+        houses = list(df["t_houses"]) if "t_houses" in df else [(h,) if h else () for h in df.get("t_house", [0] * n)]
+        lengths = np.array([len(h) for h in houses], dtype=np.int32)
+        return cls(
+            transiting=_codes(df["transiting"], point_code), natal=_codes(df["natal"], point_code),
+            aspect=_codes(df["aspect"], aspect_code),
+            start=_datetime_ns(df["start"]), end=_datetime_ns(df["end"]),
+            t_house=np.asarray(df["t_house"] if "t_house" in df else np.zeros(n), dtype=np.int8),
+            n_house=np.asarray(df["n_house"] if "n_house" in df else np.zeros(n), dtype=np.int8),
+            houses=np.fromiter((h for row in houses for h in row), dtype=np.int8, count=int(lengths.sum())),
+            houses_offsets=np.r_[0, np.cumsum(lengths)].astype(np.int32),
+            exact=_datetime_ns(df["exact"]) if "exact" in df else None,
+        )
+
+
+class IntervalBuilder:
+    """Row-wise construction of an IntervalTable (appends to plain lists, one array conversion)."""
+
+    def __init__(self, with_exact: bool = False):
+        self.cols = [[] for _ in range(7)]
+        self.houses, self.offsets = [], [0]
+        self.exact = [] if with_exact else None
+
+    def __len__(self) -> int:
+        return len(self.cols[0])
+
+    def append(self, transiting: int, natal: int, aspect: int, start_ns: int, end_ns: int,
+               houses: Sequence[int], n_house: int, exact_ns: int = NAT_NS) -> None:
+        for col, v in zip(self.cols, (transiting, natal, aspect, start_ns, end_ns, houses[0] if houses else 0,
+                                      n_house)):
+            col.append(v)
+        self.houses.extend(houses)
+        self.offsets.append(len(self.houses))
+        if self.exact is not None:
+            self.exact.append(exact_ns)
+
+    def build(self) -> IntervalTable:
+        dtypes = (np.int8, np.int8, np.int8, np.int64, np.int64, np.int8, np.int8)
+        return IntervalTable(*(np.array(c, dtype=d) for c, d in zip(self.cols, dtypes)),
+                             houses=np.array(self.houses, dtype=np.int8),
+                             houses_offsets=np.array(self.offsets, dtype=np.int32),
+                             exact=None if self.exact is None else np.array(self.exact, dtype=np.int64))
+
+
+def interval_scores(df: pd.DataFrame) -> np.ndarray:
+    """Peak score per row of a transit DataFrame (vectorized calculate_peak_score)."""
+    return peak_scores(_codes(df["transiting"], point_code), _codes(df["aspect"], aspect_code))
+
+
+def interval_labels(df: pd.DataFrame, sep: str = " ") -> pd.Series:
+    """Display labels built only when shown: "<transiting> <aspect> <natal>" (sep=None: "<transiting> -> <natal>")."""
+    t, n = df["transiting"].astype(str), df["natal"].astype(str)
+    return t + " -> " + n if sep is None else t + sep + df["aspect"].astype(str) + sep + n
+
+
+def _dt_ns(dt: datetime.datetime) -> int:
+    return pd.Timestamp(dt).value
+
+
+def _jd_ns(jd: float) -> int:
+    """jd_to_datetime as int64 ns."""
+    return _dt_ns(jd_to_datetime(jd))
+
+
+# -------------------------------------
+# Transits
+# -------------------------------------
+@metrics.timed("calculate_transits")
+def calculate_transit_table(start_date: datetime.date, end_date: datetime.date, hour_increment: float,
+                            natal_positions: Dict[int, float], chosen_planets: Sequence[Tuple[int, str]],
+                            chosen_aspect_names: Sequence[str], orb: float,
+                            natal_cusps: Sequence[float], method: str = "scan", workers: int = 1,
+                            natal_points: Optional[Sequence[Tuple[int, str]]] = None) -> IntervalTable:
+    """
+    Scans the forecast window and returns active aspect intervals as an IntervalTable.
+    chosen_planets: transiting bodies (ALL_BODIES entries)
+    natal_points: natal points aspected (ALL_POINTS entries in natal_positions; default chosen_planets)
+    natal_cusps: list of floats from swe.houses
+    method: "scan" - fixed hour_increment steps (interval edges snap to the grid),
+            "roots" - adaptive per-planet sampling + root refinement (see find_transit_events),
+            "index" - range queries on the shared sky event index (see index_transit_table).
+    workers > 1: the scan runs in time shards in a process pool (see parallel_transit_table).
+    Rows are ordered by start; "roots" and "index" also fill exact.
+    """
+    _check_transiting(chosen_planets)
+    if method == "roots":
+        return find_transit_table(start_date, end_date, natal_positions, chosen_planets,
+                                  chosen_aspect_names, orb, natal_cusps, natal_points)
+    if method == "index":
+        return index_transit_table(start_date, end_date, natal_positions, chosen_planets,
+                                   chosen_aspect_names, orb, natal_cusps, natal_points)
+    if method != "scan":
+        raise ValueError(f"Unknown transit method: {method}")
+    if workers > 1:
+        return parallel_transit_table(start_date, end_date, hour_increment, natal_positions, chosen_planets,
+                                      chosen_aspect_names, orb, natal_cusps, workers, natal_points)
+
+    parts, chunk = [], None
+    for chunk in _scan_chunks(start_date, end_date, hour_increment, natal_positions, chosen_planets,
+                              chosen_aspect_names, orb, natal_cusps, natal_points=natal_points):
+        parts.append(chunk.closed)
+    # Close remaining (open at the end of the window; no chunks for an empty window)
+    if chunk is not None:
+        parts.append(chunk.open)
+    return IntervalTable.concat(parts).sorted()
+
+
+def calculate_transits(start_date: datetime.date, end_date: datetime.date, hour_increment: float,
+                       natal_positions: Dict[int, float], chosen_planets: Sequence[Tuple[int, str]],
+                       chosen_aspect_names: Sequence[str], orb: float,
+                       natal_cusps: Sequence[float], method: str = "scan", workers: int = 1,
+                       natal_points: Optional[Sequence[Tuple[int, str]]] = None) -> pd.DataFrame:
+    """
+    DataFrame form of calculate_transit_table.
+    Columns: aspect, transiting, natal (categorical), start, end (UTC), t_house, n_house (int8),
+    t_houses (transit house ingresses during the aspect); "roots" and "index" add exact.
+    """
+    return calculate_transit_table(start_date, end_date, hour_increment, natal_positions, chosen_planets,
+                                   chosen_aspect_names, orb, natal_cusps, method, workers, natal_points).to_frame()
+
+
+def _check_transiting(chosen_planets) -> None:
+    angles = [name for pid, name in chosen_planets if pid in _ASCMC_INDEX]
+    if angles:
+        raise ValueError(f"Chart angles can only be natal points: {', '.join(angles)}")
+
+
+class _ScanChunk(NamedTuple):
+    start: datetime.datetime    # first sample of the chunk
+    end: datetime.datetime      # first sample after the chunk (end of window for the last one)
+    closed: IntervalTable       # intervals that ended inside the chunk
+    open: IntervalTable         # intervals still active, end provisionally = chunk end
+
+
+def _scan_grid(start_date, end_date, hour_increment):
+    """Scan samples: first sample, last instant of the window, step, sample count."""
+    start_dt = datetime.datetime.combine(start_date, datetime.time(0,0), tzinfo=pytz.UTC)
+    end_dt = datetime.datetime.combine(end_date, datetime.time(23,59), tzinfo=pytz.UTC)
+    delta = datetime.timedelta(hours=hour_increment)
+    return start_dt, end_dt, delta, int((end_dt - start_dt) / delta) + 1
+
+
+def _scan_chunks(start_date, end_date, hour_increment, natal_positions, chosen_planets,
+                 chosen_aspect_names, orb, natal_cusps, chunk_steps=None, step_range=None, natal_points=None):
+    """Single-chart view of _scan_group_chunks."""
+    for chunk in _scan_group_chunks(start_date, end_date, hour_increment, [natal_positions], chosen_planets,
+                                    chosen_aspect_names, orb, [natal_cusps], chunk_steps, step_range,
+                                    natal_points):
+        yield _ScanChunk(chunk.start, chunk.end, chunk.closed[0], chunk.open[0])
+
+
+def _scan_group_chunks(start_date, end_date, hour_increment, natal_positions_list, chosen_planets,
+                       chosen_aspect_names, orb, natal_cusps_list, chunk_steps=None, step_range=None,
+                       natal_points=None):
+    """
+    Core of the scan: walks the window in time chunks, carrying open aspects over
+    chunk boundaries. Only one chunk of positions/tensor is held in memory at a time.
+    Several charts share one pass: transiting positions are fetched once per chunk and
+    the aspect tensor spans the natal points of all charts (time x transit x chart*natal
+    x aspect). Yields _ScanChunk-like tuples with one closed/open table per chart.
+    natal_points: natal side of the tensor (default: chosen_planets); the transiting bodies
+    only set the number of ephemeris columns, every natal point is one more tensor column.
+    step_range (i0, i1): scan only samples i0..i1-1 of the window (a shard); aspects active at
+    i0 start there, those still active at i1 - 1 end provisionally at sample i1.
+    """
+    start_dt, end_dt, delta, n_steps = _scan_grid(start_date, end_date, hour_increment)
+    first_step, last_step = step_range or (0, n_steps)
+    jd_start = datetime_to_jd(start_dt)
+    start_ns, end_ns, delta_ns = _dt_ns(start_dt), _dt_ns(end_dt), delta // datetime.timedelta(microseconds=1) * 1000
+
+    natal_points = chosen_planets if natal_points is None else natal_points
+    t_ids = [pid for pid, _ in chosen_planets]
+    n_ids = [pid for pid, _ in natal_points]
+    n_c = len(natal_positions_list)
+    natal_lon = np.array([[positions[pid] for pid in n_ids] for positions in natal_positions_list])
+    angles = np.array([ASPECT_ANGLES[a] for a in chosen_aspect_names], dtype=float)
+
+    # Calculate Natal Houses for all natal points once (static), per chart
+    house_indexes = [get_house_index(cusps) for cusps in natal_cusps_list]
+    natal_houses = np.array([hi.houses_of(lon) if hi else np.zeros(len(n_ids), dtype=np.int8)
+                             for hi, lon in zip(house_indexes, natal_lon)], dtype=np.int8).reshape(n_c, len(n_ids))
+    natal_lon = natal_lon.reshape(-1)
+
+    # (transit, chart, natal, aspect) keys flattened in C order; same body never aspects itself
+    n_t, n_n, n_a = len(t_ids), len(n_ids), len(angles)
+    key_shape = (n_t, n_c, n_n, n_a)
+    key_mask = np.broadcast_to((np.array(t_ids)[:, None] != np.array(n_ids)[None, :])[:, None, :, None],
+                               key_shape).reshape(-1)
+    t_codes = [point_code(name) for _, name in chosen_planets]
+    n_codes = [point_code(name) for _, name in natal_points]
+    a_codes = [aspect_code(a) for a in chosen_aspect_names]
+
+    def append(out, k, i_start, houses, end):
+        ti, ci, ni, ai = np.unravel_index(k, key_shape)
+        out[ci].append(t_codes[ti], n_codes[ni], a_codes[ai], start_ns + i_start * delta_ns, end,
+                       houses, natal_houses[ci, ni])
+
+    open_starts = {}  # key -> (start sample, transit houses visited so far)
+    prev_active = np.zeros(key_mask.size, dtype=bool)
+    chunk = max(1, SCAN_CHUNK_ELEMENTS // max(1, key_mask.size))
+    if chunk_steps:
+        chunk = min(chunk, chunk_steps)
+    for c0 in range(first_step, last_step, chunk):
+        c1 = min(last_step, c0 + chunk)
+        t_lon, _ = get_planet_positions(jd_start + np.arange(c0, c1) * (hour_increment / 24.0), t_ids)
+        t_house_arr = [hi.houses_of(t_lon) if hi else None for hi in house_indexes]
+        active = aspect_tensor(t_lon, natal_lon, angles, orb)
+        active = active.reshape(active.shape[0], -1) & key_mask
+
+        def track_houses(k, houses, t_from, t_to):
+            # Transit house ingresses (in the key's chart) while the aspect is active (samples t_from..t_to-1)
+            arr = t_house_arr[k // (n_n * n_a) % n_c]
+            if arr is not None:
+                _append_houses(houses, arr[t_from:t_to, k // (n_c * n_n * n_a)])
+
+        # Edge detection: +1 = aspect starts at sample t, -1 = aspect ended at sample t
+        edges = np.diff(np.vstack([prev_active[None, :], active]).astype(np.int8), axis=0)
+        keys, steps = np.nonzero(edges.T)
+        closed = [IntervalBuilder() for _ in range(n_c)]
+        seg_from = dict.fromkeys(open_starts, 0)  # chunk sample where the active run began
+        for k, t in zip(keys, steps):
+            if edges[t, k] > 0:
+                # Capture House info at start of aspect
+                open_starts[k] = (c0 + t, [])
+                seg_from[k] = t
+            else:
+                i_start, houses = open_starts.pop(k)
+                track_houses(k, houses, seg_from.pop(k), t)
+                append(closed, k, i_start, houses, start_ns + (c0 + t) * delta_ns)
+        for k, (i_start, houses) in open_starts.items():
+            track_houses(k, houses, seg_from[k], c1 - c0)
+        prev_active = active[-1]
+
+        chunk_end = start_dt + c1 * delta if c1 < n_steps else end_dt
+        still_open = [IntervalBuilder() for _ in range(n_c)]
+        for k, (i, h) in open_starts.items():
+            append(still_open, k, i, h, start_ns + c1 * delta_ns if c1 < n_steps else end_ns)
+        yield _ScanChunk(start_dt + c0 * delta, chunk_end, [b.build() for b in closed],
+                         [b.build() for b in still_open])
+
+
+# -------------------------------------
+# Parallel time-sharded scan
+# -------------------------------------
+_scan_pool = None
+
+
+def get_scan_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool for sharded scans, kept for the life of the process (resized on demand)."""
+    global _scan_pool
+    if _scan_pool is None or _scan_pool._max_workers != workers:
+        if _scan_pool is not None:
+            _scan_pool.shutdown(wait=False)
+        _scan_pool = ProcessPoolExecutor(max_workers=workers, initializer=set_ephemeris_path,
+                                         initargs=(_ephemeris_path,))
+    return _scan_pool
+
+
+def _scan_shard(args) -> IntervalTable:
+    """Pool worker: serial scan of one shard (rows still open at its end end at the next shard's start)."""
+    parts, chunk = [], None
+    for chunk in _scan_chunks(*args):
+        parts.append(chunk.closed)
+    if chunk is not None:
+        parts.append(chunk.open)
+    return IntervalTable.concat(parts)
+
+
+def _row_houses(table: IntervalTable, i: int) -> List[int]:
+    return table.houses[table.houses_offsets[i]:table.houses_offsets[i + 1]].tolist()
+
+
+def _stitch_shards(tables: Sequence[IntervalTable], edges_ns: Sequence[int]) -> IntervalTable:
+    """
+    Joins shard scans: a row still open at the end of shard j (end == edges_ns[j], the first
+    sample of shard j + 1) and the row of the same (transiting, natal, aspect) that starts at
+    that sample are one interval - start, t_house and n_house from the left piece, the
+    ingresses of both pieces joined. An open row without continuation ended at the edge.
+    """
+    def key(t, i):
+        return int(t.transiting[i]), int(t.natal[i]), int(t.aspect[i])
+
+    done, carry = [], IntervalTable.empty()
+    for j, table in enumerate(tables):
+        if len(carry):
+            left = {key(table, i): i for i in np.flatnonzero(table.start == edges_ns[j - 1]).tolist()}
+            joined, used = IntervalBuilder(), []
+            for c in range(len(carry)):
+                i = left.get(key(carry, c))
+                if i is None:
+                    continue
+                houses = _row_houses(carry, c)
+                _append_houses(houses, _row_houses(table, i))
+                joined.append(*key(carry, c), int(carry.start[c]), int(table.end[i]), houses, int(carry.n_house[c]))
+                used.append((c, i))
+            carried = np.isin(np.arange(len(carry)), [c for c, _ in used])
+            done.append(carry.take(np.flatnonzero(~carried)))
+            rest = np.ones(len(table), dtype=bool)
+            rest[[i for _, i in used]] = False
+            table = IntervalTable.concat([table.take(np.flatnonzero(rest)), joined.build()])
+        if j < len(edges_ns):
+            still_open = table.end == edges_ns[j]
+            done.append(table.take(np.flatnonzero(~still_open)))
+            carry = table.take(np.flatnonzero(still_open))
+        else:
+            done.append(table)
+    return IntervalTable.concat(done).sorted()
+
+
+def parallel_transit_table(start_date: datetime.date, end_date: datetime.date, hour_increment: float,
+                           natal_positions: Dict[int, float], chosen_planets: Sequence[Tuple[int, str]],
+                           chosen_aspect_names: Sequence[str], orb: float, natal_cusps: Sequence[float],
+                           workers: Optional[int] = None,
+                           natal_points: Optional[Sequence[Tuple[int, str]]] = None) -> IntervalTable:
+    """
+    calculate_transit_table(method="scan") with the window cut into time shards on the same
+    sample grid, scanned in a process pool (get_scan_pool) and stitched (_stitch_shards).
+    Identical to the serial scan; windows too short for two shards run serially.
+    """
+    workers = workers or os.cpu_count() or 1
+    _, _, delta, n_steps = _scan_grid(start_date, end_date, hour_increment)
+    min_steps = datetime.timedelta(days=SCAN_SHARD_MIN_DAYS) // delta
+    n_shards = min(2 * workers, n_steps // max(1, min_steps))
+    if workers < 2 or n_shards < 2:
+        return calculate_transit_table(start_date, end_date, hour_increment, natal_positions, chosen_planets,
+                                       chosen_aspect_names, orb, natal_cusps, natal_points=natal_points)
+
+    bounds = [round(k * n_steps / n_shards) for k in range(n_shards + 1)]
+    start_ns = _dt_ns(datetime.datetime.combine(start_date, datetime.time(0,0), tzinfo=pytz.UTC))
+    delta_ns = delta // datetime.timedelta(microseconds=1) * 1000
+    args = [(start_date, end_date, hour_increment, natal_positions, chosen_planets, chosen_aspect_names, orb,
+             tuple(natal_cusps), None, (i0, i1), natal_points) for i0, i1 in zip(bounds[:-1], bounds[1:])]
+    tables = list(get_scan_pool(workers).map(_scan_shard, args))
+    return _stitch_shards(tables, [start_ns + i * delta_ns for i in bounds[1:-1]])
+
+
+class TransitChunk(NamedTuple):
+    start: datetime.datetime
+    end: datetime.datetime
+    intervals: pd.DataFrame       # closed intervals (final)
+    open: pd.DataFrame            # still active at chunk end (provisional end)
+    pulse_idx: pd.DatetimeIndex   # pulse samples in [start, end)
+    pulse: np.ndarray             # raw (unsmoothed) pulse values
+
+
+def iter_transits(start_date: datetime.date, end_date: datetime.date, hour_increment: float,
+                  natal_positions: Dict[int, float], chosen_planets: Sequence[Tuple[int, str]],
+                  chosen_aspect_names: Sequence[str], orb: float, natal_cusps: Sequence[float],
+                  chunk_days: float = 30, pulse_resolution: float = 4,
+                  natal_points: Optional[Sequence[Tuple[int, str]]] = None):
+    """
+    Generator mode of calculate_transits: yields a TransitChunk per chunk_days as the
+    scan moves forward, with the intervals closed so far and the Energy Pulse samples
+    of that chunk (exact - every interval active in the chunk is known by then).
+    Concatenating all .intervals plus the last .open equals calculate_transits.
+    """
+    _check_transiting(chosen_planets)
+    steps = max(1, int(round(chunk_days * 24 / hour_increment)))
+    pulse_start = pd.Timestamp(start_date).tz_localize("UTC")
+    pulse_last = pd.Timestamp(end_date).tz_localize("UTC")
+    pulse_step = pd.Timedelta(hours=pulse_resolution)
+    for chunk in _scan_chunks(start_date, end_date, hour_increment, natal_positions, chosen_planets,
+                              chosen_aspect_names, orb, natal_cusps, chunk_steps=steps, natal_points=natal_points):
+        # Pulse samples of the global grid (as in calculate_pulse) that fall into [chunk.start, chunk.end)
+        k0 = -(-(pd.Timestamp(chunk.start) - pulse_start).value // pulse_step.value)
+        k1 = -(-(pd.Timestamp(chunk.end) - pulse_start).value // pulse_step.value)
+        k1 = min(k1, (pulse_last - pulse_start).value // pulse_step.value + 1)
+        pulse_idx = pd.DatetimeIndex(pulse_start + pulse_step * np.arange(k0, max(k0, k1)))
+        active = IntervalTable.concat([chunk.closed, chunk.open])
+        yield TransitChunk(chunk.start, chunk.end, chunk.closed.sorted().to_frame(), chunk.open.to_frame(),
+                           pulse_idx, pulse_scores(active, natal_positions, orb, pulse_idx))
+
+
+def get_planet_positions(jds, planet_ids: Sequence[int], interpolate: bool = False):
+    """
+    Batch position API: (time x planet) float64 arrays of longitude and speed.
+    Hourly-grid times are served from the shared ephemeris cache; interpolate=True
+    interpolates off-grid times from it instead of calling swisseph.
+    """
+    return get_cache().positions(jds, planet_ids, interpolate)
+
+
+def angle_diff_array(a, b):
+    """Vectorized angle_diff (broadcasting)."""
+    d = np.abs(a - b) % 360
+    return np.where(d > 180, 360 - d, d)
+
+
+def aspect_tensor(t_lon, natal_lon, angles, orb: float):
+    """
+    Broadcasted aspect detection over (time x transit x natal x aspect).
+    Like is_aspect, only the first matching aspect (in selection order) counts.
+    """
+    diff = angle_diff_array(t_lon[:, :, None], natal_lon[None, None, :])
+    within = np.abs(diff[..., None] - angles) <= orb
+    # Orbs narrower than half the closest angle gap cannot overlap: nothing to deduplicate
+    if 2 * orb < np.diff(np.sort(angles)).min(initial=np.inf):
+        return within
+    first = np.cumsum(within, axis=-1) == 1
+    return within & first
+
+
+# -------------------------------------
+# Root-finding transit search
+# -------------------------------------
+def _wrap180(x):
+    return (x + 180.0) % 360.0 - 180.0
+
+
+def _refine_root(func, a: float, b: float, fa: float) -> float:
+    """
+    Safeguarded Newton iteration for func(jd) -> (value, slope) on a bracket [a, b].
+    Falls back to bisection whenever the Newton step leaves the bracket.
+    """
+    x = (a + b) / 2
+    for _ in range(60):
+        v, d = func(x)
+        if v == 0:
+            return x
+        if (v > 0) == (fa > 0):
+            a, fa = x, v
+        else:
+            b = x
+        nx = x - v / d if d else None
+        if nx is None or not a < nx < b:
+            nx = (a + b) / 2
+        if abs(nx - x) < ROOT_TOLERANCE_DAYS or b - a < ROOT_TOLERANCE_DAYS:
+            return nx
+        x = nx
+    return x
+
+
+def _sample_planet(pid: int, jd0: float, jd1: float, step: float):
+    """Longitude and speed of one planet on an even grid covering [jd0, jd1]."""
+    n = max(1, int(math.ceil((jd1 - jd0) / step)))
+    jds = np.linspace(jd0, jd1, n + 1)
+    lon, spd = compute_positions(jds, [pid])
+    return jds, lon[:, 0], spd[:, 0]
+
+
+def _target_windows(pid: int, target: float, orb: float, jds, lon, jd0: float, jd1: float):
+    """
+    Orb windows of one planet around one target longitude.
+    Returns list of [start_jd, end_jd, exact_jd or None].
+    """
+    def state(jd):
+        pos, _ = swe.calc_ut(jd, pid, swe.FLG_SWIEPH | swe.FLG_SPEED)
+        return _wrap180(pos[0] - target), pos[3]
+
+    def orb_edge(jd):
+        sep, speed = state(jd)
+        return abs(sep) - orb, math.copysign(speed, sep)
+
+    sep = _wrap180(lon - target)
+    edge = np.abs(sep) - orb
+    inside = edge <= 0
+
+    windows = []
+    current = [jd0, None, None] if inside[0] else None
+    for i in np.flatnonzero(inside[1:] != inside[:-1]):
+        t = _refine_root(orb_edge, jds[i], jds[i + 1], edge[i])
+        if inside[i + 1]:
+            current = [t, None, None]
+        else:
+            current[1] = t
+            windows.append(current)
+            current = None
+    if current is not None:
+        current[1] = jd1
+        windows.append(current)
+
+    # Exact hits: sign change of the separation (ignore the jump at +-180)
+    flips = np.flatnonzero((np.sign(sep[1:]) != np.sign(sep[:-1])) & (np.abs(sep[:-1]) < 90))
+    for i in flips:
+        t = jds[i] if sep[i] == 0 else _refine_root(state, jds[i], jds[i + 1], sep[i])
+        for w in windows:
+            if w[0] <= t <= w[1] and w[2] is None:
+                w[2] = t
+                break
+    return windows
+
+
+def find_transit_events(start_date: datetime.date, end_date: datetime.date,
+                        natal_positions: Dict[int, float], chosen_planets: Sequence[Tuple[int, str]],
+                        chosen_aspect_names: Sequence[str], orb: float,
+                        natal_cusps: Sequence[float],
+                        natal_points: Optional[Sequence[Tuple[int, str]]] = None) -> pd.DataFrame:
+    """DataFrame form of find_transit_table."""
+    return find_transit_table(start_date, end_date, natal_positions, chosen_planets, chosen_aspect_names,
+                              orb, natal_cusps, natal_points).to_frame()
+
+
+def find_transit_table(start_date: datetime.date, end_date: datetime.date,
+                       natal_positions: Dict[int, float], chosen_planets: Sequence[Tuple[int, str]],
+                       chosen_aspect_names: Sequence[str], orb: float,
+                       natal_cusps: Sequence[float],
+                       natal_points: Optional[Sequence[Tuple[int, str]]] = None) -> IntervalTable:
+    """
+    Root-finding alternative to the hourly scan.
+    Each transiting planet is sampled with its own step (it moves at most orb/2 per step,
+    so slow planets need only a few samples per month). Orb entry/exit and exact crossings
+    are bracketed on that grid and refined by Newton iteration on the longitude speed to
+    ROOT_TOLERANCE_DAYS. Same columns as the scan plus "exact" (NaT if the aspect
+    does not perfect inside the window).
+    """
+    start_dt = datetime.datetime.combine(start_date, datetime.time(0,0), tzinfo=pytz.UTC)
+    end_dt = datetime.datetime.combine(end_date, datetime.time(23,59), tzinfo=pytz.UTC)
+    jd0, jd1 = datetime_to_jd(start_dt), datetime_to_jd(end_dt)
+    if jd1 < jd0:
+        return IntervalTable.empty(with_exact=True)
+    start_ns, end_ns = _dt_ns(start_dt), _dt_ns(end_dt)
+
+    natal_points = chosen_planets if natal_points is None else natal_points
+    house_index = get_house_index(natal_cusps)
+    natal_houses_map = {}
+    if house_index:
+        for pid, _ in natal_points:
+            if pid in natal_positions:
+                natal_houses_map[pid] = house_index.house_of(natal_positions[pid])
+
+    intervals = IntervalBuilder(with_exact=True)
+    for t_id, t_name in chosen_planets:
+        step = min(MAX_ROOT_STEP_DAYS, (orb / 2) / MAX_DAILY_MOTION.get(t_name, 15.4))
+        jds, lon, _ = _sample_planet(t_id, jd0, jd1, step)
+
+        for n_id, n_name in natal_points:
+            if t_id == n_id: continue
+            n_pos = natal_positions[n_id]
+            for aname in chosen_aspect_names:
+                angle = ASPECT_ANGLES[aname]
+                targets = [(n_pos + angle) % 360]
+                if angle % 180:
+                    targets.append((n_pos - angle) % 360)
+                for target in targets:
+                    for w_start, w_end, w_exact in _target_windows(t_id, target, orb, jds, lon, jd0, jd1):
+                        houses = []
+                        if house_index:
+                            # House at the true start, then ingresses seen on the sampling grid
+                            houses.append(house_index.house_of(get_planet_position(w_start, t_id)))
+                            _append_houses(houses, house_index.houses_of(lon[(jds > w_start) & (jds < w_end)]))
+                        intervals.append(
+                            point_code(t_name), point_code(n_name), aspect_code(aname),
+                            start_ns if w_start == jd0 else _jd_ns(w_start),
+                            end_ns if w_end == jd1 else _jd_ns(w_end),
+                            houses, natal_houses_map.get(n_id, 0),
+                            _jd_ns(w_exact) if w_exact is not None else NAT_NS)
+    return intervals.build().sorted()
+
+
+# -------------------------------------
+# Lifetime transits (slow planets, multi-resolution)
+# -------------------------------------
+_LIFETIME_BLOCK = 256
+
+
+@functools.lru_cache(maxsize=1024)
+def _lifetime_block(pid: int, step: float, block: int) -> np.ndarray:
+    """Longitudes at GRID_ORIGIN_JD + k * step for k in one block (shared by all charts)."""
+    jds = GRID_ORIGIN_JD + np.arange(block * _LIFETIME_BLOCK, (block + 1) * _LIFETIME_BLOCK) * step
+    table = get_cache().table
+    if table is not None and table.has(pid) and table.covers(jds).all():
+        lon, _ = table.positions(jds, [pid])
+    else:
+        lon, _ = compute_positions(jds, [pid])
+    return lon[:, 0]
+
+
+class _Track(NamedTuple):
+    """Unwrapped longitude samples and finite-difference slopes (per step) of one planet."""
+    jd0: float
+    step: float
+    lon: np.ndarray
+    slope: np.ndarray
+
+    @classmethod
+    def sample(cls, pid: int, step: float, jd0: float, jd1: float) -> "_Track":
+        # Two extra samples each side for the slopes, grid anchored at GRID_ORIGIN_JD
+        k0 = math.floor((jd0 - GRID_ORIGIN_JD) / step) - 2
+        k1 = math.ceil((jd1 - GRID_ORIGIN_JD) / step) + 2
+        b0, b1 = k0 // _LIFETIME_BLOCK, k1 // _LIFETIME_BLOCK
+        lon = np.concatenate([_lifetime_block(pid, step, b) for b in range(b0, b1 + 1)])
+        lon = lon[k0 - b0 * _LIFETIME_BLOCK:k1 - b0 * _LIFETIME_BLOCK + 1]
+        return cls.from_samples(GRID_ORIGIN_JD + k0 * step, step, lon)
+
+    @classmethod
+    def from_samples(cls, jd0: float, step: float, lon) -> "_Track":
+        """Track of evenly spaced longitudes; the first and last two samples only pad the slopes."""
+        lon = np.unwrap(lon, period=360.0)
+        slope = np.zeros_like(lon)
+        slope[2:-2] = (8 * (lon[3:-1] - lon[1:-3]) - (lon[4:] - lon[:-4])) / 12
+        return cls(jd0, step, lon, slope)
+
+    def at(self, jds):
+        """Cubic Hermite interpolation: (unwrapped longitude, speed in deg/day)."""
+        x = (np.asarray(jds, dtype=float) - self.jd0) / self.step
+        i = np.clip(np.floor(x).astype(np.int64), 2, len(self.lon) - 4)
+        t = x - i
+        p0, p1, m0, m1 = self.lon[i], self.lon[i + 1], self.slope[i], self.slope[i + 1]
+        t2, t3 = t * t, t * t * t
+        lon = (2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * m0 + (3 * t2 - 2 * t3) * p1 + (t3 - t2) * m1
+        d = (6 * t2 - 6 * t) * (p0 - p1) + (3 * t2 - 4 * t + 1) * m0 + (3 * t2 - 2 * t) * m1
+        return lon, d / self.step
+
+
+def _refine_roots(func, a, b, fa):
+    """Vectorized _refine_root: func(x) -> (values, slopes) for arrays of brackets [a, b]."""
+    a, b, fa = np.array(a, dtype=float), np.array(b, dtype=float), np.array(fa, dtype=float)
+    fb = func(b)[0]
+    x = np.clip(a - fa * (b - a) / np.where(fb != fa, fb - fa, 1.0), a, b)  # regula falsi start
+    for _ in range(60):
+        v, d = func(x)
+        same = (v > 0) == (fa > 0)
+        a, fa = np.where(same, x, a), np.where(same, v, fa)
+        b = np.where(same, b, x)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            nx = x - v / d
+        bad = ~((nx > a) & (nx < b))
+        nx = np.where(bad, (a + b) / 2, nx)
+        done = (np.abs(nx - x) < ROOT_TOLERANCE_DAYS) | (b - a < ROOT_TOLERANCE_DAYS) | (v == 0)
+        x = np.where(v == 0, x, nx)
+        if done.all():
+            break
+    return x
+
+
+def _lifetime_passes(track: _Track, targets: np.ndarray, orb: float, margin: float, jd0: float, jd1: float):
+    """
+    Orb windows of one planet around all target longitudes at once.
+    Coarse steps with an end within orb + margin of a target are resampled LIFETIME_SUBSTEPS
+    times on the interpolated track; orb edges and exact hits bracketed there are refined
+    together. Returns {target index: [[start_jd, end_jd, [exact_jds]], ...]}.
+    """
+    sep = _wrap180(track.lon[:, None] - targets[None, :])
+    near = np.abs(sep) <= orb + margin
+    step_idx, tgt = np.nonzero(near[:-1] | near[1:])
+    keep = (track.jd0 + (step_idx + 1) * track.step > jd0) & (track.jd0 + step_idx * track.step < jd1)
+    step_idx, tgt = step_idx[keep], tgt[keep]
+
+    # Fine samples of each candidate (step, target) pair, both step ends included
+    sub = np.arange(LIFETIME_SUBSTEPS + 1) / LIFETIME_SUBSTEPS
+    steps, inverse = np.unique(step_idx, return_inverse=True)
+    fine_jd = track.jd0 + (steps[:, None] + sub[None, :]) * track.step
+    fine_lon, _ = track.at(fine_jd)
+    sep = _wrap180(fine_lon[inverse] - targets[tgt, None])
+    jds = fine_jd[inverse]
+    inside = np.abs(sep) <= orb
+
+    p_edge, k_edge = np.nonzero(inside[:, 1:] != inside[:, :-1])
+    p_exact, k_exact = np.nonzero((np.sign(sep[:, 1:]) != np.sign(sep[:, :-1])) & (np.abs(sep[:, :-1]) < 90))
+    p = np.r_[p_edge, p_exact]
+    k = np.r_[k_edge, k_exact]
+    is_edge = np.arange(len(p)) < len(p_edge)
+    target = targets[tgt[p]]
+
+    def func(jd):
+        lon, spd = track.at(jd)
+        d = _wrap180(lon - target)
+        return np.where(is_edge, np.abs(d) - orb, d), np.where(is_edge, np.sign(d) * spd, spd)
+
+    fa = np.where(is_edge, np.abs(sep[p, k]) - orb, sep[p, k])
+    roots = _refine_roots(func, jds[p, k], jds[p, k + 1], fa) if len(p) else np.zeros(0)
+    entering = inside[p, k + 1]
+
+    # Walk the roots of each target in time order
+    start_sep = _wrap180(track.at(jd0)[0] - targets)
+    windows = {}
+    order = np.lexsort((roots, tgt[p]))
+    current = {j: [jd0, None, []] for j in np.flatnonzero(np.abs(start_sep) <= orb)}
+    for r in order:
+        t, j = roots[r], tgt[p[r]]
+        if not jd0 < t < jd1:
+            continue
+        if not is_edge[r]:
+            if j in current:
+                current[j][2].append(t)
+        elif entering[r]:
+            current[j] = [t, None, []]
+        elif j in current:
+            w = current.pop(j)
+            w[1] = t
+            windows.setdefault(j, []).append(w)
+    for j, w in current.items():
+        w[1] = jd1
+        windows.setdefault(j, []).append(w)
+    return windows
+
+
+def _jd_ns_array(jds) -> np.ndarray:
+    """Vectorized _jd_ns."""
+    return np.rint((np.asarray(jds, dtype=float) - JD_UNIX_EPOCH) * 86400).astype(np.int64) * 1_000_000_000
+
+
+@metrics.timed("lifetime")
+def calculate_lifetime_transits(birth_utc: datetime.datetime, natal_positions: Dict[int, float],
+                                natal_cusps: Sequence[float] = (), years: float = 90,
+                                planets: Sequence[str] = LIFETIME_PLANETS,
+                                aspect_names: Optional[Sequence[str]] = None, orb: float = 2.0) -> pd.DataFrame:
+    """
+    Life timeline of slow-planet transits to every natal point from birth_utc to +years.
+    Each planet is sampled by swisseph only every LIFETIME_STEP_DAYS; candidate steps near
+    a target are filled by cubic interpolation and orb edges / exact hits refined on it.
+    Passes of one (transit, natal, aspect, side) within SYNODIC_DAYS - retrograde double
+    and triple hits - form one row from the first entry to the last exit from orb.
+    Columns: the calculate_transits columns plus exact (first hit) and exacts (all hits).
+    """
+    aspect_names = list(ASPECT_ANGLES) if aspect_names is None else list(aspect_names)
+    jd0 = datetime_to_jd(birth_utc)
+    jd1 = jd0 + years * 365.25
+    house_index = get_house_index(natal_cusps)
+
+    # Targets: natal point +- aspect angle (one target for conjunction / opposition)
+    meta = []
+    for n_id, n_pos in natal_positions.items():
+        if n_id not in _PLANET_NAMES:
+            continue
+        n_house = house_index.house_of(n_pos) if house_index else 0
+        for aname in aspect_names:
+            angle = ASPECT_ANGLES[aname]
+            for target in sorted({(n_pos + angle) % 360, (n_pos - angle) % 360}):
+                meta.append((n_id, aname, target, n_house))
+    targets = np.array([m[2] for m in meta])
+
+    events = []  # (t_id, n_id, aspect, start, end, exacts, n_house)
+    tracks = {}
+    for t_name in planets:
+        t_id, step = PLANET_IDS[t_name], LIFETIME_STEP_DAYS.get(t_name, MAX_ROOT_STEP_DAYS)
+        track = tracks[t_id] = _Track.sample(t_id, step, jd0, jd1)
+        margin = MAX_DAILY_MOTION.get(t_name, 15.4) * step / 2
+        synodic = SYNODIC_DAYS.get(t_name, 365)
+        for j, windows in _lifetime_passes(track, targets, orb, margin, jd0, jd1).items():
+            n_id, aname, _, n_house = meta[j]
+            if n_id == t_id and windows[0][0] == jd0:
+                windows = windows[1:]  # the natal position itself, not a return
+            group = None
+            for w in windows:
+                if group is not None and w[0] - group[1] < synodic:
+                    group[1], group[2] = w[1], group[2] + w[2]
+                    continue
+                if group is not None:
+                    events.append((t_id, n_id, aname) + tuple(group) + (n_house,))
+                group = w
+            if group is not None:
+                events.append((t_id, n_id, aname) + tuple(group) + (n_house,))
+
+    events.sort(key=lambda e: (e[3], point_code(_PLANET_NAMES[e[0]]), point_code(_PLANET_NAMES[e[1]]),
+                               aspect_code(e[2])))
+    starts = np.array([e[3] for e in events])
+    ends = np.array([e[4] for e in events])
+    t_houses = [[] for _ in events]
+    if house_index and events:
+        # House at the start, then ingresses on a daily grid
+        for t_id, track in tracks.items():
+            rows = [i for i, e in enumerate(events) if e[0] == t_id]
+            if not rows:
+                continue
+            days = [np.arange(starts[i], ends[i], 1.0) for i in rows]
+            lon, _ = track.at(np.concatenate(days))
+            houses = np.split(house_index.houses_of(lon % 360), np.cumsum([len(d) for d in days])[:-1])
+            for i, h in zip(rows, houses):
+                _append_houses(t_houses[i], h)
+
+    table = IntervalBuilder(with_exact=True)
+    start_ns, end_ns = _jd_ns_array(starts), _jd_ns_array(ends)
+    n_hits = [len(e[5]) for e in events]
+    hits_ns = _jd_ns_array([t for e in events for t in e[5]])
+    first_hit = np.cumsum([0] + n_hits[:-1])
+    for i, (t_id, n_id, aname, _, _, hits, n_house) in enumerate(events):
+        table.append(point_code(_PLANET_NAMES[t_id]), point_code(_PLANET_NAMES[n_id]), aspect_code(aname),
+                     start_ns[i], end_ns[i], t_houses[i], n_house, hits_ns[first_hit[i]] if hits else NAT_NS)
+    hit_times = list(pd.to_datetime(hits_ns, utc=True))
+    df = table.build().to_frame()
+    df["exacts"] = pd.Series([tuple(hit_times[a:a + n]) for a, n in zip(first_hit, n_hits)], dtype=object)
+    return df
+
+
+# -------------------------------------
+# Sky event index (natal-independent)
+# -------------------------------------
+# Every transit is "planet P within orb of longitude L". Per planet, the sampled track is
+# cut at its stations into runs on which the unwrapped longitude is monotonic; inside a run
+# the time at which P passes any longitude (or an orb edge) is a binary search on the
+# samples, refined by Newton steps on the cubic interpolant of _Track (within a few seconds
+# of the roots mode). Blocks are shared by all charts, so a forecast costs
+# O(runs x targets x log n) lookups instead of a time scan.
+class _SkyBlock(NamedTuple):
+    track: _Track           # samples of the block plus two padding samples each side
+    runs: np.ndarray        # track indices of run boundaries (stations), incl. block start and end
+
+    def times(self, idx):
+        return self.track.jd0 + np.asarray(idx) * self.track.step
+
+
+@functools.lru_cache(maxsize=SKY_INDEX_BLOCKS)
+def _sky_block(pid: int, block: int) -> _SkyBlock:
+    """One block of the index, anchored at GRID_ORIGIN_JD; adjacent blocks share the boundary sample."""
+    step = SKY_STEP_HOURS.get(_PLANET_NAMES.get(pid), 1) / 24.0
+    n = int(round(SKY_BLOCK_DAYS / step))
+    jds = GRID_ORIGIN_JD + block * SKY_BLOCK_DAYS + np.arange(-2, n + 3) * step
+    table = get_cache().table
+    if table is not None and table.has(pid) and table.covers(jds).all():
+        lon, _ = table.positions(jds, [pid])
+    else:
+        lon, _ = compute_positions(jds, [pid])
+    track = _Track.from_samples(jds[0], step, lon[:, 0])
+    direction = np.sign(np.diff(track.lon[2:-2]))
+    stations = np.flatnonzero(direction[1:] * direction[:-1] < 0) + 3
+    return _SkyBlock(track, np.concatenate([[2], stations, [n + 2]]))
+
+
+def _sky_times(blk: _SkyBlock, i0: int, x, values, sign: float):
+    """Times at which the run starting at track index i0 (x: ascending run coordinates) reaches values."""
+    t = blk.times(np.arange(i0, i0 + len(x)))
+    times = np.interp(values, x, t)
+    inside = (values > x[0]) & (values < x[-1])
+    if inside.any():
+        # Newton on the cubic interpolant, kept inside the bracketing sample interval
+        j = np.clip(np.searchsorted(x, values[inside]), 1, len(x) - 1)
+        lo, hi, ti = t[j - 1], t[j], times[inside]
+        for _ in range(2):
+            lon, speed = blk.track.at(ti)
+            ti = np.clip(ti - np.divide(sign * lon - values[inside], sign * speed,
+                                        out=np.zeros_like(ti), where=speed != 0), lo, hi)
+        times[inside] = ti
+    return times
+
+
+def sky_windows(pid: int, targets, orb: float, jd0: float, jd1: float):
+    """
+    Orb windows of one planet around target longitudes within [jd0, jd1] from the index.
+    Returns arrays (target index, start jd, end jd, exact jd or NaN), sorted by target and
+    start; windows continuing over a station or block boundary are joined, the first exact
+    hit of a joined window is kept.
+    """
+    targets = np.asarray(targets, dtype=float) % 360.0
+    parts = []
+    blocks = range(math.floor((jd0 - GRID_ORIGIN_JD) / SKY_BLOCK_DAYS),
+                   math.floor((jd1 - GRID_ORIGIN_JD) / SKY_BLOCK_DAYS) + 1) if jd1 >= jd0 else ()
+    for b in blocks:
+        blk = _sky_block(pid, b)
+        for i0, i1 in zip(blk.runs[:-1], blk.runs[1:]):
+            if blk.times(i1) < jd0 or blk.times(i0) > jd1:
+                continue
+            # Ascending coordinates (retrograde runs mirrored); every turn of 360 deg is a level
+            sign = 1.0 if blk.track.lon[i1] >= blk.track.lon[i0] else -1.0
+            x = sign * blk.track.lon[i0:i1 + 1]
+            level = sign * targets
+            k_min = np.ceil((x[0] - orb - level) / 360.0)
+            counts = np.maximum(np.floor((x[-1] + orb - level) / 360.0) - k_min + 1, 0).astype(np.int64)
+            target = np.repeat(np.arange(len(targets)), counts)
+            turn = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            level = level[target] + 360.0 * (k_min[target] + turn)
+            exact = _sky_times(blk, i0, x, level, sign)
+            exact[(level < x[0]) | (level > x[-1])] = np.nan
+            parts.append((target, _sky_times(blk, i0, x, level - orb, sign), _sky_times(blk, i0, x, level + orb, sign),
+                          exact))
+    if not parts:
+        return tuple(np.empty(0, dtype=dtype) for dtype in (np.int64, float, float, float))
+
+    target, start, end, exact = (np.concatenate(col) for col in zip(*parts))
+    start, end = np.maximum(start, jd0), np.minimum(end, jd1)
+    keep = end >= start
+    target, start, end, exact = target[keep], start[keep], end[keep], exact[keep]
+    exact[(exact < start) | (exact > end)] = np.nan
+
+    order = np.lexsort((start, target))
+    target, start, end, exact = target[order], start[order], end[order], exact[order]
+    first = np.ones(len(start), dtype=bool)
+    first[1:] = (target[1:] != target[:-1]) | (start[1:] > end[:-1] + 1e-7)
+    heads = np.flatnonzero(first)
+    target, start = target[heads], start[heads]
+    end, exact = np.maximum.reduceat(end, heads), np.fmin.reduceat(exact, heads)
+    keep = end > start
+    return target[keep], start[keep], end[keep], exact[keep]
+
+
+def _sky_track(pid: int, jd0: float, jd1: float):
+    """(sample jds, unwrapped longitude) of the index covering [jd0, jd1]."""
+    b0 = math.floor((jd0 - GRID_ORIGIN_JD) / SKY_BLOCK_DAYS)
+    b1 = math.floor((jd1 - GRID_ORIGIN_JD) / SKY_BLOCK_DAYS)
+    blocks = [_sky_block(pid, b) for b in range(b0, b1 + 1)]
+    lon = np.unwrap(np.concatenate([blocks[0].track.lon[2:3]] + [blk.track.lon[3:-2] for blk in blocks]),
+                    period=360.0)
+    return blocks[0].times(2 + np.arange(len(lon))), lon
+
+
+def sky_positions(pid: int, jds):
+    """Longitude and speed of one planet at jds, interpolated from the sky index blocks."""
+    jds = np.asarray(jds, dtype=float)
+    blocks = np.floor((jds - GRID_ORIGIN_JD) / SKY_BLOCK_DAYS).astype(np.int64)
+    lon, spd = np.empty(len(jds)), np.empty(len(jds))
+    for b in np.unique(blocks).tolist():
+        sel = blocks == b
+        lon[sel], spd[sel] = _sky_block(pid, b).track.at(jds[sel])
+    return lon % 360.0, spd
+
+
+def index_transit_table(start_date: datetime.date, end_date: datetime.date,
+                        natal_positions: Dict[int, float], chosen_planets: Sequence[Tuple[int, str]],
+                        chosen_aspect_names: Sequence[str], orb: float,
+                        natal_cusps: Sequence[float],
+                        natal_points: Optional[Sequence[Tuple[int, str]]] = None) -> IntervalTable:
+    """
+    Transit intervals as range queries on the sky event index (sky_windows): all
+    (natal point, aspect, side) target longitudes of a transiting planet are looked up in
+    one vectorized query. Same columns as find_transit_table (exact: first hit in the window).
+    """
+    start_dt = datetime.datetime.combine(start_date, datetime.time(0,0), tzinfo=pytz.UTC)
+    end_dt = datetime.datetime.combine(end_date, datetime.time(23,59), tzinfo=pytz.UTC)
+    jd0, jd1 = datetime_to_jd(start_dt), datetime_to_jd(end_dt)
+    if jd1 < jd0:
+        return IntervalTable.empty(with_exact=True)
+    start_ns, end_ns = _dt_ns(start_dt), _dt_ns(end_dt)
+    natal_points = chosen_planets if natal_points is None else natal_points
+    house_index = get_house_index(natal_cusps)
+
+    intervals = IntervalBuilder(with_exact=True)
+    for t_id, t_name in chosen_planets:
+        # Target longitudes in the order of the roots mode: natal point, aspect, +angle / -angle
+        keys, targets = [], []
+        for n_id, n_name in natal_points:
+            if t_id == n_id: continue
+            n_pos = natal_positions[n_id]
+            n_house = house_index.house_of(n_pos) if house_index else 0
+            for aname in chosen_aspect_names:
+                angle = ASPECT_ANGLES[aname]
+                for side in ((1, -1) if angle % 180 else (1,)):
+                    keys.append((point_code(n_name), aspect_code(aname), n_house))
+                    targets.append(n_pos + side * angle)
+        if not targets:
+            continue
+        target, w_start, w_end, w_exact = sky_windows(t_id, targets, orb, jd0, jd1)
+        if house_index:
+            jds, lon = _sky_track(t_id, jd0, jd1)
+            start_houses = house_index.houses_of(np.interp(w_start, jds, lon) % 360.0)
+            i0 = np.searchsorted(jds, w_start, side="right")
+            i1 = np.searchsorted(jds, w_end, side="left")
+        starts = np.where(w_start == jd0, start_ns, _jd_ns_array(w_start)).tolist()
+        ends = np.where(w_end == jd1, end_ns, _jd_ns_array(w_end)).tolist()
+        exacts = np.where(np.isnan(w_exact), NAT_NS, _jd_ns_array(np.nan_to_num(w_exact))).tolist()
+        for j, k in enumerate(target.tolist()):
+            n_code, a_code, n_house = keys[k]
+            houses = []
+            if house_index:
+                # House at the true start, then ingresses seen on the index samples
+                houses.append(int(start_houses[j]))
+                _append_houses(houses, house_index.houses_of(lon[i0[j]:i1[j]] % 360.0))
+            intervals.append(point_code(t_name), n_code, a_code, starts[j], ends[j], houses, n_house, exacts[j])
+    return intervals.build().sorted()
+
+
+# -------------------------------------
+# Energy Pulse
+# -------------------------------------
+@metrics.timed("pulse")
+def calculate_pulse(df, natal_pos: Dict[int, float], orb_max: float,
+                    start_date: datetime.date, end_date: datetime.date,
+                    resolution_hours: float = 4, sampling: str = "grid") -> Tuple[pd.DatetimeIndex, pd.Series]:
+    """
+    Energy Pulse: sum of dynamic scores of all active aspects per sample
+    (df: transit DataFrame or IntervalTable). Returns (sample index, score series).
+    sampling: "grid" - every resolution_hours, smoothed (rolling mean of 3),
+              "adaptive" - unsmoothed, at interval start / exact / end times and refined
+              where the score changes fast (see adaptive_pulse_scores).
+    """
+    if sampling == "adaptive":
+        pulse_idx, values = adaptive_pulse_scores([df], [natal_pos], orb_max, start_date, end_date)
+        return pulse_idx, pd.Series(values[0])
+    if sampling != "grid":
+        raise ValueError(f"Unknown pulse sampling: {sampling}")
+    pulse_idx = pd.date_range(start=pd.Timestamp(start_date).tz_localize("UTC"),
+                              end=pd.Timestamp(end_date).tz_localize("UTC"),
+                              freq=pd.Timedelta(hours=resolution_hours))
+    pulse_values = pulse_scores(df, natal_pos, orb_max, pulse_idx)
+    return pulse_idx, smooth_pulse(pulse_values)
+
+
+def smooth_pulse(pulse_values) -> pd.Series:
+    # Smooth data for "organic" feel
+    return pd.Series(pulse_values).rolling(window=3, center=True, min_periods=1).mean().fillna(0)
+
+
+def pulse_scores(intervals, natal_pos: Dict[int, float], orb_max: float,
+                 pulse_idx: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Raw pulse values on a sorted sample index (intervals: IntervalTable or transit DataFrame).
+    Each interval is mapped to its sample range with searchsorted on the sorted sample
+    grid, then precision / applying-separating / peak score are evaluated as arrays
+    over all (interval, sample) pairs and summed with bincount in a single pass.
+    """
+    return group_pulse_scores([intervals], [natal_pos], orb_max, pulse_idx)[0]
+
+
+class _PulseRows(NamedTuple):
+    """Intervals of several charts (concatenated) with the per-row inputs of the dynamic score."""
+    table: IntervalTable
+    chart: np.ndarray           # chart index
+    n_pos: np.ndarray           # natal longitude
+    target: np.ndarray          # aspect angle
+    peak: np.ndarray            # calculate_peak_score
+    max_motion: np.ndarray      # MAX_DAILY_MOTION of the transiting body
+
+    @classmethod
+    def build(cls, intervals_list, natal_pos_list: Sequence[Dict[int, float]]) -> "_PulseRows":
+        tables = [t if isinstance(t, IntervalTable) else IntervalTable.from_frame(t) for t in intervals_list]
+        table = IntervalTable.concat(tables)
+        chart = np.repeat(np.arange(len(tables)), [len(t) for t in tables])
+
+        # Per-(chart, code) lookup tables, gathered per row
+        natal_by_code = np.full((len(tables), len(POINT_NAMES)), np.nan)
+        for c, natal_pos in enumerate(natal_pos_list):
+            for pid, lon_n in natal_pos.items():
+                if pid in _PLANET_NAMES:
+                    natal_by_code[c, point_code(_PLANET_NAMES[pid])] = lon_n
+        motion_by_code = np.array([MAX_DAILY_MOTION.get(n, 15.4) for n in POINT_NAMES])
+        angle_by_code = np.array([ASPECT_ANGLES[a] for a in ASPECT_NAMES], dtype=float)
+        return cls(table, chart, natal_by_code[chart, table.natal], angle_by_code[table.aspect], table.scores(),
+                   motion_by_code[table.transiting])
+
+    def scores(self, rows, t_lon, t_spd, orb_max: float) -> np.ndarray:
+        """Dynamic score of interval rows[k] for transiting longitude / speed t_lon[k], t_spd[k]."""
+        current_orb, rate = orb_and_rate(t_lon, t_spd, self.n_pos[rows], self.target[rows])
+
+        # Precision factor (1.0 at exact, 0.0 at max orb); applying vs separating from speed
+        precision = np.clip(1.0 - current_orb / orb_max, 0.0, None)
+        trend = trend_factor(rate, self.max_motion[rows])
+        return np.where(current_orb > orb_max, 0.0, self.peak[rows] * precision ** 2 * trend)
+
+    def side(self, rows, t_lon) -> np.ndarray:
+        """Sign of the orb rate per unit transiting speed: flips when the aspect goes exact."""
+        delta = _wrap180(np.asarray(t_lon) - self.n_pos[rows])
+        return np.sign(np.abs(delta) - self.target[rows]) * np.sign(delta)
+
+    def positions(self, rows, times_ns):
+        """Transiting longitude and speed of interval rows[k] at times_ns[k] (interpolated from the cache)."""
+        codes, col = np.unique(self.table.transiting[rows], return_inverse=True)
+        jds = JD_UNIX_EPOCH + np.asarray(times_ns) / 86_400e9
+        lon, spd = np.empty(len(jds)), np.empty(len(jds))
+        for j, c in enumerate(codes):
+            sel = col == j
+            lon[sel], spd[sel] = (a[:, 0] for a in get_planet_positions(jds[sel], [PLANET_IDS[POINT_NAMES[c]]],
+                                                                         interpolate=True))
+        return lon, spd
+
+
+def group_pulse_scores(intervals_list, natal_pos_list: Sequence[Dict[int, float]], orb_max: float,
+                       pulse_idx: pd.DatetimeIndex) -> np.ndarray:
+    """pulse_scores of several charts in one pass: (chart x sample) raw pulse values."""
+    pr = _PulseRows.build(intervals_list, natal_pos_list)
+    table, chart = pr.table, pr.chart
+    n_c, n_s = len(natal_pos_list), len(pulse_idx)
+    pulse_values = np.zeros((n_c, n_s))
+
+    if len(table) and n_s:
+        # Active when start <= t < end
+        sample_ns = pulse_idx.as_unit("ns").asi8
+        i0 = np.searchsorted(sample_ns, table.start, side="left")
+        i1 = np.searchsorted(sample_ns, table.end, side="left")
+        counts = np.maximum(i1 - i0, 0)
+        rows = np.repeat(np.arange(len(table)), counts)
+        samples = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(i0, counts)
+
+        # Positions and speeds of every transiting planet at every sample (once for all charts).
+        # The scan has cached these hours already; after roots / index they are interpolated from
+        # the sky index instead of filling whole hourly segments for a sparse grid
+        planets, t_col = np.unique(table.transiting, return_inverse=True)
+        t_col = t_col[rows]
+        jds = JD_UNIX_EPOCH + sample_ns / 86_400e9
+        lon, spd = np.empty((n_s, len(planets))), np.empty((n_s, len(planets)))
+        for j, c in enumerate(planets.tolist()):
+            pid = PLANET_IDS[POINT_NAMES[c]]
+            if get_cache().is_cached(jds, pid):
+                lon[:, j], spd[:, j] = (a[:, 0] for a in get_planet_positions(jds, [pid]))
+            else:
+                lon[:, j], spd[:, j] = sky_positions(pid, jds)
+        scores = pr.scores(rows, lon[samples, t_col], spd[samples, t_col], orb_max)
+        pulse_values = np.bincount(chart[rows] * n_s + samples, weights=scores,
+                                   minlength=n_c * n_s).reshape(n_c, n_s)
+    return pulse_values
+
+
+def adaptive_pulse_scores(intervals_list, natal_pos_list: Sequence[Dict[int, float]], orb_max: float,
+                          start_date: datetime.date, end_date: datetime.date,
+                          tolerance: float = PULSE_TOLERANCE) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    """
+    Energy Pulse on adaptive samples instead of a fixed grid: (sample index, chart x sample raw values).
+    Every interval starts with nodes at its start and end; node segments are bisected while the
+    midpoint score is more than tolerance x the largest peak score off the straight line, down to
+    PULSE_MIN_STEP_MINUTES. Segments in which the aspect goes exact (applying -> separating, where
+    the trend factor jumps) are solved for the hit, which gets a node one second on either side.
+    Scores are only evaluated at an interval's own nodes (positions interpolated from the hourly
+    cache). The samples are the union of all nodes; each interval contributes its linear
+    interpolant there, so quiet periods cost nothing and peaks sit on the exact times.
+    """
+    w0 = _dt_ns(datetime.datetime.combine(start_date, datetime.time(0, 0), tzinfo=pytz.UTC))
+    w1 = _dt_ns(datetime.datetime.combine(end_date, datetime.time(0, 0), tzinfo=pytz.UTC))
+    if w1 < w0:
+        return pd.DatetimeIndex([], dtype="datetime64[ns, UTC]"), np.zeros((len(natal_pos_list), 0))
+    pr = _PulseRows.build(intervals_list, natal_pos_list)
+    table, n_c = pr.table, len(natal_pos_list)
+    start, end = np.maximum(table.start, w0), np.minimum(table.end, w1)
+    rows = np.flatnonzero(end > start)
+    start, end = start[rows], end[rows]
+
+    def evaluate(r, t):
+        lon, spd = pr.positions(r, t)
+        return pr.scores(r, lon, spd, orb_max), pr.side(r, lon)
+
+    # Bisection from the interval edges; final segments whose ends lie on different sides of
+    # the aspect angle contain an exact hit
+    node_row, node_t = np.r_[rows, rows], np.r_[start, end]
+    node_v, node_side = evaluate(node_row, node_t)
+    seg_r, ta, tb = rows, start, end
+    va, vb, sa, sb = node_v[:len(rows)], node_v[len(rows):], node_side[:len(rows)], node_side[len(rows):]
+    tol = tolerance * (np.abs(pr.peak[rows]).max() if len(rows) else 0.0)
+    min_step, max_step = PULSE_MIN_STEP_MINUTES * 60_000_000_000, PULSE_MAX_STEP_HOURS * 3_600_000_000_000
+    parts, hits = [(node_row, node_t, node_v)], []
+    for _ in range(PULSE_MAX_ROUNDS):
+        split = tb - ta >= 2 * min_step
+        flips = sa * sb < 0
+        hits.append((seg_r[~split & flips], ta[~split & flips], tb[~split & flips]))
+        seg_r, ta, tb, va, vb, sa, sb = (col[split] for col in (seg_r, ta, tb, va, vb, sa, sb))
+        if not len(seg_r):
+            break
+        tm = ta + (tb - ta) // 2
+        vm, sm = evaluate(seg_r, tm)
+        parts.append((seg_r, tm, vm))
+        again = (np.abs(vm - (va + vb) / 2) > tol) | (tb - ta > max_step)
+        for x, y, sx, sy in ((ta, tm, sa, sm), (tm, tb, sm, sb)):
+            done = ~again & (sx * sy < 0)
+            hits.append((seg_r[done], x[done], y[done]))
+        seg_r, tm, vm, sm = seg_r[again], tm[again], vm[again], sm[again]
+        seg_r, ta, tb, va, vb, sa, sb = (np.r_[seg_r, seg_r], np.r_[ta[again], tm], np.r_[tm, tb[again]],
+                                         np.r_[va[again], vm], np.r_[vm, vb[again]],
+                                         np.r_[sa[again], sm], np.r_[sm, sb[again]])
+
+    # Exact hits: Newton on the separation from the aspect point inside each bracketing segment
+    hit_r, lo, hi = (np.concatenate(col) for col in zip(*hits))
+    if len(hit_r):
+        t = lo + (hi - lo) // 2
+        lon, _ = pr.positions(hit_r, t)
+        target = pr.n_pos[hit_r] + np.where(_wrap180(lon - pr.n_pos[hit_r]) < 0, -1.0, 1.0) * pr.target[hit_r]
+        for _ in range(PULSE_NEWTON_ROUNDS):
+            lon, spd = pr.positions(hit_r, t)
+            step = (np.divide(_wrap180(lon - target), spd, out=np.zeros_like(lon), where=spd != 0)
+                    * 86_400e9).astype(np.int64)
+            t = np.clip(t - step, lo, hi)
+            if np.abs(step).max() < 1_000_000_000:
+                break
+        hit_r, hit_t = np.r_[hit_r, hit_r], np.r_[np.maximum(t - 1_000_000_000, lo), np.minimum(t + 1_000_000_000, hi)]
+        parts.append((hit_r, hit_t, evaluate(hit_r, hit_t)[0]))
+    node_row, node_t, node_v = (np.concatenate(col) for col in zip(*parts))
+    node_t = (node_t + 500_000_000) // 1_000_000_000 * 1_000_000_000  # whole seconds
+
+    # Samples: union of all nodes plus the window edges; intervals interpolated linearly there
+    samples = np.unique(np.r_[w0, node_t, w1])
+    n_s = len(samples)
+    node_s = np.searchsorted(samples, node_t)
+    order = np.lexsort((node_s, node_row))
+    node_row, node_s, node_t, node_v = node_row[order], node_s[order], node_t[order], node_v[order]
+    node_key = node_row * (n_s + 1) + node_s
+
+    i0, i1 = np.searchsorted(samples, start), np.searchsorted(samples, end, side="right")
+    counts = i1 - i0
+    pair_row = np.repeat(rows, counts)
+    pair_s = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(i0, counts)
+    j = np.searchsorted(node_key, pair_row * (n_s + 1) + pair_s, side="right") - 1
+    k = np.minimum(j + 1, len(node_t) - 1)
+    span = np.where(node_row[k] == pair_row, node_t[k] - node_t[j], 0)
+    w = np.divide(samples[pair_s] - node_t[j], span, out=np.zeros(len(j)), where=span > 0)
+    values = node_v[j] + w * (node_v[k] - node_v[j])
+    pulse_values = np.bincount(pr.chart[pair_row] * n_s + pair_s, weights=values,
+                               minlength=n_c * n_s).reshape(n_c, n_s).astype(float)
+    return pd.DatetimeIndex(samples.astype("datetime64[ns]")).tz_localize("UTC"), pulse_values
+
+
+# -------------------------------------
+# Group forecasts (family / team)
+# -------------------------------------
+@dataclass
+class GroupForecast:
+    """Per-chart transit intervals and pulses of one shared window, plus the group pulse."""
+    intervals: List[IntervalTable]
+    pulse_idx: pd.DatetimeIndex
+    pulses: List[pd.Series]         # per chart (smoothed on the grid)
+    group_pulse: pd.Series          # sum over all charts (smoothed on the grid)
+
+
+@metrics.timed("group_transits")
+def calculate_group_transits(start_date: datetime.date, end_date: datetime.date, hour_increment: float,
+                             charts: Sequence[NatalChart], chosen_planets: Sequence[Tuple[int, str]],
+                             chosen_aspect_names: Sequence[str], orb: float,
+                             pulse_resolution: float = 4,
+                             natal_points: Optional[Sequence[Tuple[int, str]]] = None,
+                             pulse_sampling: str = "grid") -> GroupForecast:
+    """
+    calculate_transit_table + calculate_pulse for several natal charts over one window.
+    Transiting positions are fetched once per scan chunk / pulse grid and aspects to
+    the natal points of all charts are detected in one tensor, so the cost grows with
+    charts x natal points, not with ephemeris calls. Every chart's natal positions must
+    contain the natal points (default: the chosen planets, as in the single scan).
+    pulse_sampling as in calculate_pulse ("adaptive": shared samples, unsmoothed).
+    """
+    if pulse_sampling not in ("grid", "adaptive"):
+        raise ValueError(f"Unknown pulse sampling: {pulse_sampling}")
+    if not charts:
+        raise ValueError("No charts given")
+    _check_transiting(chosen_planets)
+    parts, chunk = [[] for _ in charts], None
+    for chunk in _scan_group_chunks(start_date, end_date, hour_increment, [c.positions for c in charts],
+                                    chosen_planets, chosen_aspect_names, orb, [c.cusps for c in charts],
+                                    natal_points=natal_points):
+        for part, closed in zip(parts, chunk.closed):
+            part.append(closed)
+    # Close remaining (open at the end of the window; no chunks for an empty window)
+    for part, still_open in zip(parts, chunk.open if chunk is not None else []):
+        part.append(still_open)
+    tables = [IntervalTable.concat(part).sorted() for part in parts]
+
+    if pulse_sampling == "adaptive":
+        pulse_idx, raw = adaptive_pulse_scores(tables, [c.positions for c in charts], orb, start_date, end_date)
+        return GroupForecast(tables, pulse_idx, [pd.Series(values) for values in raw], pd.Series(raw.sum(axis=0)))
+    pulse_idx = pd.date_range(start=pd.Timestamp(start_date).tz_localize("UTC"),
+                              end=pd.Timestamp(end_date).tz_localize("UTC"),
+                              freq=pd.Timedelta(hours=pulse_resolution))
+    raw = group_pulse_scores(tables, [c.positions for c in charts], orb, pulse_idx)
+    return GroupForecast(tables, pulse_idx, [smooth_pulse(values) for values in raw], smooth_pulse(raw.sum(axis=0)))
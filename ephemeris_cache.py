@@ -0,0 +1,226 @@
+"""
+Shared ephemeris position cache.
+
+Transiting positions for a given UTC hour are the same for every user, so they are
+kept process-wide on a fixed hourly grid (1900-2100) instead of per request.
+Segments of SEGMENT_HOURS samples are filled lazily per body, kept in an LRU
+and optionally persisted to disk as .npy files that are opened memory-mapped.
+
+If a precomputed table (ephemeris_table.py) is present, segments it covers are
+zero-copy views into the shared memory-mapped file and off-grid times are
+interpolated from it instead of calling swisseph. Without a table, callers can ask
+for the same interpolation from the cached hourly segments (positions(interpolate=True)).
+
+Configuration (environment):
+    ASTROPULSE_EPHE_CACHE_DIR       - directory for persistent segments (off if unset)
+    ASTROPULSE_EPHE_CACHE_SEGMENTS  - max. in-memory segments (default 4096, ~47 MB)
+    ASTROPULSE_EPHE_TABLE           - precomputed table path ("off" to disable;
+                                      default ephemeris/astropulse_hourly.eph if present)
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+import swisseph as swe
+
+GRID_ORIGIN_JD = 2415020.5   # 1900-01-01 00:00 UTC
+GRID_END_JD = 2488069.5      # 2100-01-01 00:00 UTC
+GRID_STEPS_PER_DAY = 24
+SEGMENT_HOURS = 720          # 30 days per segment
+CALC_FLAGS = swe.FLG_SWIEPH | swe.FLG_SPEED
+
+_GRID_SIZE = int(round((GRID_END_JD - GRID_ORIGIN_JD) * GRID_STEPS_PER_DAY))
+
+
+def compute_positions(jds, body_ids: Sequence[int]):
+    """
+    Direct swisseph evaluation: (time x body) float64 arrays of longitude and speed.
+    swisseph has no vector call, so this is one tight loop over calc_ut.
+    """
+    jds = np.asarray(jds, dtype=float)
+    lon = np.empty((len(jds), len(body_ids)))
+    spd = np.empty_like(lon)
+    for j, pid in enumerate(body_ids):
+        for i, jd in enumerate(jds):
+            pos, _ = swe.calc_ut(jd, pid, CALC_FLAGS)
+            lon[i, j], spd[i, j] = pos[0], pos[3]
+    return lon, spd
+
+
+class EphemerisCache:
+    """Process-wide LRU of (segment, body) -> array of shape (2, SEGMENT_HOURS): lon, speed."""
+
+    def __init__(self, max_segments: int = 4096, cache_dir: Optional[str] = None, table=None):
+        self.max_segments = max_segments
+        self.table = None
+        if table is not None:
+            # Usable only if the table rows line up with the hourly grid
+            offset = (table.jd0 - GRID_ORIGIN_JD) * GRID_STEPS_PER_DAY
+            if table.step_hours * GRID_STEPS_PER_DAY == 24 and abs(offset - round(offset)) < 1e-6:
+                self.table, self._table_offset = table, int(round(offset))
+        self.cache_dir = None
+        if cache_dir:
+            # Values depend on the swisseph build and flags - keep them apart on disk
+            self.cache_dir = os.path.join(cache_dir, f"swe{swe.version}_f{CALC_FLAGS}_h{SEGMENT_HOURS}")
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self._segments = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.table_hits = 0
+
+    # -- segments --
+    def _segment_path(self, seg: int, body: int) -> str:
+        return os.path.join(self.cache_dir, f"{body}_{seg}.npy")
+
+    def _load_segment(self, seg: int, body: int):
+        if self.table is not None and self.table.has(body):
+            r0 = seg * SEGMENT_HOURS - self._table_offset
+            if 0 <= r0 and r0 + SEGMENT_HOURS <= self.table.n_steps:
+                self.table_hits += 1
+                return self.table.grid_slice(body, r0, r0 + SEGMENT_HOURS)
+
+        if self.cache_dir:
+            path = self._segment_path(seg, body)
+            if os.path.exists(path):
+                self.disk_hits += 1
+                return np.load(path, mmap_mode="r")
+
+        i0 = seg * SEGMENT_HOURS
+        jds = GRID_ORIGIN_JD + np.arange(i0, i0 + SEGMENT_HOURS) / GRID_STEPS_PER_DAY
+        lon, spd = compute_positions(jds, [body])
+        data = np.vstack([lon[:, 0], spd[:, 0]])
+
+        if self.cache_dir:
+            # Atomic write: concurrent workers may fill the same segment
+            path = self._segment_path(seg, body)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp, path)
+        return data
+
+    def segment(self, seg: int, body: int):
+        key = (seg, body)
+        with self._lock:
+            data = self._segments.get(key)
+            if data is not None:
+                self._segments.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        # Fill outside the lock; a duplicate fill by another thread is harmless
+        data = self._load_segment(seg, body)
+        with self._lock:
+            self._segments[key] = data
+            self._segments.move_to_end(key)
+            while len(self._segments) > self.max_segments:
+                self._segments.popitem(last=False)
+        return data
+
+    def has_segment(self, seg: int, body: int) -> bool:
+        """True if the segment is served without swisseph (in memory, in the table or on disk)."""
+        if (seg, body) in self._segments:
+            return True
+        if self.table is not None and self.table.has(body):
+            r0 = seg * SEGMENT_HOURS - self._table_offset
+            if 0 <= r0 and r0 + SEGMENT_HOURS <= self.table.n_steps:
+                return True
+        return bool(self.cache_dir) and os.path.exists(self._segment_path(seg, body))
+
+    def is_cached(self, jds, body: int) -> bool:
+        """True if no segment has to be computed to serve the hourly-grid times in jds."""
+        idx = (np.atleast_1d(np.asarray(jds, dtype=float)) - GRID_ORIGIN_JD) * GRID_STEPS_PER_DAY
+        segs = np.unique(np.clip(np.rint(idx), 0, _GRID_SIZE - 1).astype(np.int64) // SEGMENT_HOURS)
+        return all(self.has_segment(seg, body) for seg in segs.tolist())
+
+    # -- lookups --
+    def _gather(self, grid_idx, body: int):
+        """Longitude and speed at hourly grid indices from the cached segments."""
+        segs, offsets = np.divmod(grid_idx, SEGMENT_HOURS)
+        # One fancy-index over the stacked segments instead of a mask per segment
+        uniq, inv = np.unique(segs, return_inverse=True)
+        data = np.stack([self.segment(int(seg), body) for seg in uniq])
+        return data[inv, 0, offsets].astype(float), data[inv, 1, offsets].astype(float)
+
+    def positions(self, jds, body_ids: Sequence[int], interpolate: bool = False):
+        """
+        (time x body) longitude and speed. Times on the hourly grid are served from
+        the cache, anything else (off-grid or outside 1900-2100) is interpolated from
+        the precomputed table if it covers them, or goes to swisseph.
+        interpolate: off-grid times inside the grid are interpolated from the two cached
+        neighbours instead (cubic Hermite on lon/speed as in the table, no swisseph call).
+        """
+        jds = np.atleast_1d(np.asarray(jds, dtype=float))
+        idx = (jds - GRID_ORIGIN_JD) * GRID_STEPS_PER_DAY
+        grid_idx = np.rint(idx).astype(np.int64)
+        on_grid = (np.abs(idx - grid_idx) < 1e-6) & (grid_idx >= 0) & (grid_idx < _GRID_SIZE)
+
+        lon = np.empty((len(jds), len(body_ids)))
+        spd = np.empty_like(lon)
+        if not on_grid.all():
+            off = ~on_grid
+            if self.table is not None and all(map(self.table.has, body_ids)):
+                interp = off & self.table.covers(jds)
+                lon[interp], spd[interp] = self.table.positions(jds[interp], body_ids)
+                off &= ~interp
+            if interpolate:
+                interp = off & (idx >= 0) & (idx < _GRID_SIZE - 1)
+                if interp.any():
+                    lon[interp], spd[interp] = self._hermite(idx[interp], body_ids)
+                    off &= ~interp
+            if off.any():
+                lon[off], spd[off] = compute_positions(jds[off], body_ids)
+        if on_grid.any():
+            for j, body in enumerate(body_ids):
+                lon[on_grid, j], spd[on_grid, j] = self._gather(grid_idx[on_grid], body)
+        return lon, spd
+
+    def _hermite(self, idx, body_ids: Sequence[int]):
+        """Cubic Hermite interpolation between grid samples at fractional grid indices idx."""
+        i = np.floor(idx).astype(np.int64)
+        t = idx - i
+        h = 1.0 / GRID_STEPS_PER_DAY
+        h00, h10, h01, h11 = 2 * t**3 - 3 * t**2 + 1, t**3 - 2 * t**2 + t, -2 * t**3 + 3 * t**2, t**3 - t**2
+        lon = np.empty((len(idx), len(body_ids)))
+        spd = np.empty_like(lon)
+        for j, body in enumerate(body_ids):
+            p, m = self._gather(np.r_[i, i + 1], body)
+            (p0, p1), (m0, m1) = np.split(p, 2), np.split(m, 2)
+            p1 = p0 + (p1 - p0 + 180.0) % 360.0 - 180.0  # unwrap across 0/360
+            lon[:, j] = (h00 * p0 + h10 * h * m0 + h01 * p1 + h11 * h * m1) % 360.0
+            spd[:, j] = m0 + t * (m1 - m0)
+        return lon, spd
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits,
+                "table_hits": self.table_hits, "segments": len(self._segments),
+                "max_segments": self.max_segments}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._segments.clear()
+            self.hits = self.misses = self.disk_hits = self.table_hits = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EphemerisCache:
+    """Process-wide cache instance (configured from the environment on first use)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from ephemeris_table import open_table
+                _cache = EphemerisCache(
+                    max_segments=int(os.environ.get("ASTROPULSE_EPHE_CACHE_SEGMENTS", 4096)),
+                    cache_dir=os.environ.get("ASTROPULSE_EPHE_CACHE_DIR") or None,
+                    table=open_table(),
+                )
+    return _cache
@@ -0,0 +1,212 @@
+"""
+Precomputed ephemeris table (memory-mapped).
+
+A build step exports longitude and speed of the ALL_PLANETS bodies on an hourly grid
+(1950-2100 by default) as float32 into one versioned binary file. Every process
+opens it with np.memmap, so all workers on a host share one page-cache copy and
+there is no per-process load time.
+
+File layout (little endian):
+    header  HEADER_SIZE bytes: magic, format version, jd0, step (hours), n_steps,
+            n_bodies, swisseph flags, swisseph version, body ids
+    data    float32 [n_bodies, 2 (lon, speed), n_steps]
+
+Values between grid points use cubic Hermite interpolation of the longitude with
+the stored speeds as derivatives; speeds are interpolated linearly. Measured against
+swisseph (`check`, 20,000 random times 1950-2100, hourly table), max. |error|:
+    longitude   1.53e-5 deg on and between grid points for every body (float32
+                rounding dominates; ~0.06 arcsec)
+    speed       5e-7 deg/day on the grid, 2.5e-4 deg/day between (swisseph's own
+                speeds wiggle on an hourly scale for the outer planets)
+Aspect edges can therefore move by one scan sample only when the orb boundary is
+crossed within ~1.5e-5 deg of a grid point (once in a year of all-planet results).
+Building the full table takes ~13 min (1.3 M hourly steps x 10 bodies, 105 MB).
+
+Usage:
+    python ephemeris_table.py build [--start 1950 --end 2100] [-o ephemeris/astropulse_hourly.eph]
+    python ephemeris_table.py check [--samples 20000]
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+import swisseph as swe
+
+from ephemeris_cache import CALC_FLAGS, compute_positions
+
+MAGIC = b"APEPHEM\0"
+FORMAT_VERSION = 1
+HEADER_SIZE = 4096
+_HEADER = struct.Struct("<8sIddqiI32s")  # magic, version, jd0, step_hours, n_steps, n_bodies, flags, swe version
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ephemeris", "astropulse_hourly.eph")
+DEFAULT_BODIES = (swe.SUN, swe.MOON, swe.MERCURY, swe.VENUS, swe.MARS,
+                  swe.JUPITER, swe.SATURN, swe.URANUS, swe.NEPTUNE, swe.PLUTO)
+BUILD_CHUNK_STEPS = 24 * 366
+
+
+def _year_jd(year: int) -> float:
+    return swe.julday(year, 1, 1, 0.0)
+
+
+# -------------------------------------
+# Build
+# -------------------------------------
+def build_table(path: str = DEFAULT_PATH, start_year: int = 1950, end_year: int = 2100,
+                step_hours: float = 1.0, bodies: Sequence[int] = DEFAULT_BODIES, progress=None) -> None:
+    jd0 = _year_jd(start_year)
+    n_steps = int(round((_year_jd(end_year) - jd0) * 24 / step_hours)) + 1
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, jd0, step_hours, n_steps, len(bodies), CALC_FLAGS,
+                          swe.version.encode()[:32]) + struct.pack(f"<{len(bodies)}i", *bodies)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+    data = np.memmap(tmp, dtype="<f4", mode="r+", offset=HEADER_SIZE, shape=(len(bodies), 2, n_steps))
+    for i0 in range(0, n_steps, BUILD_CHUNK_STEPS):
+        i1 = min(n_steps, i0 + BUILD_CHUNK_STEPS)
+        lon, spd = compute_positions(jd0 + np.arange(i0, i1) * (step_hours / 24.0), bodies)
+        data[:, 0, i0:i1] = lon.T
+        data[:, 1, i0:i1] = spd.T
+        if progress:
+            progress(i1, n_steps)
+    data.flush()
+    del data
+    os.replace(tmp, path)
+
+
+# -------------------------------------
+# Lookup
+# -------------------------------------
+class EphemerisTable:
+    """Read-only memory-mapped table; positions() mirrors EphemerisCache.positions."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            raw = f.read(HEADER_SIZE)
+        magic, version, jd0, step_hours, n_steps, n_bodies, flags, swe_version = _HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not an AstroPulse ephemeris table")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: table format {version}, expected {FORMAT_VERSION} - rebuild it")
+        if flags != CALC_FLAGS:
+            raise ValueError(f"{path}: built with swisseph flags {flags}, expected {CALC_FLAGS}")
+        self.path = path
+        self.jd0, self.step_hours, self.n_steps = jd0, step_hours, n_steps
+        self.step_days = step_hours / 24.0
+        self.swe_version = swe_version.rstrip(b"\0").decode()
+        self.bodies = list(struct.unpack_from(f"<{n_bodies}i", raw, _HEADER.size))
+        self.column = {body: j for j, body in enumerate(self.bodies)}
+        self.data = np.memmap(path, dtype="<f4", mode="r", offset=HEADER_SIZE, shape=(n_bodies, 2, n_steps))
+
+    @property
+    def jd_end(self) -> float:
+        return self.jd0 + (self.n_steps - 1) * self.step_days
+
+    def has(self, body: int) -> bool:
+        return body in self.column
+
+    def covers(self, jds) -> np.ndarray:
+        jds = np.asarray(jds, dtype=float)
+        return (jds >= self.jd0) & (jds <= self.jd_end)
+
+    def grid_slice(self, body: int, i0: int, i1: int):
+        """Zero-copy (2, i1 - i0) view of grid rows i0..i1-1: lon, speed."""
+        return self.data[self.column[body], :, i0:i1]
+
+    def positions(self, jds, body_ids: Sequence[int]):
+        """(time x body) longitude and speed; Hermite interpolation between grid points."""
+        jds = np.atleast_1d(np.asarray(jds, dtype=float))
+        x = (jds - self.jd0) / self.step_days
+        i = np.clip(np.floor(x).astype(np.int64), 0, self.n_steps - 2)
+        t = x - i
+        h = self.step_days
+        h00, h10, h01, h11 = 2 * t**3 - 3 * t**2 + 1, t**3 - 2 * t**2 + t, -2 * t**3 + 3 * t**2, t**3 - t**2
+
+        lon = np.empty((len(jds), len(body_ids)))
+        spd = np.empty_like(lon)
+        for j, body in enumerate(body_ids):
+            table = self.data[self.column[body]]
+            p0, p1 = table[0, i].astype(float), table[0, i + 1].astype(float)
+            m0, m1 = table[1, i].astype(float), table[1, i + 1].astype(float)
+            p1 = p0 + (p1 - p0 + 180.0) % 360.0 - 180.0  # unwrap across 0/360
+            lon[:, j] = (h00 * p0 + h10 * h * m0 + h01 * p1 + h11 * h * m1) % 360.0
+            # Speed: linear between the stored speeds (the Hermite derivative amplifies float32 rounding)
+            spd[:, j] = m0 + t * (m1 - m0)
+        return lon, spd
+
+
+def open_table(path: Optional[str] = None) -> Optional[EphemerisTable]:
+    """The table at path (default: ASTROPULSE_EPHE_TABLE or DEFAULT_PATH), None if absent."""
+    path = path or os.environ.get("ASTROPULSE_EPHE_TABLE") or DEFAULT_PATH
+    if path.lower() in ("0", "off") or not os.path.exists(path):
+        return None
+    return EphemerisTable(path)
+
+
+# -------------------------------------
+# Error check
+# -------------------------------------
+def check_table(table: EphemerisTable, samples: int = 20000, seed: int = 0) -> dict:
+    """Max. |error| against swisseph per body, on grid points and at random times."""
+    rng = np.random.default_rng(seed)
+    on_grid = table.jd0 + rng.integers(0, table.n_steps, samples) * table.step_days
+    between = rng.uniform(table.jd0, table.jd_end, samples)
+    result = {}
+    for body in table.bodies:
+        row = {}
+        for name, jds in (("grid", on_grid), ("between", between)):
+            lon, spd = table.positions(jds, [body])
+            ref_lon, ref_spd = compute_positions(jds, [body])
+            row[f"{name}_lon"] = float(np.max(np.abs((lon - ref_lon + 180) % 360 - 180)))
+            row[f"{name}_speed"] = float(np.max(np.abs(spd - ref_spd)))
+        result[swe.get_planet_name(body)] = row
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AstroPulse precomputed ephemeris table")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="export the table from swisseph")
+    p_build.add_argument("-o", "--output", default=DEFAULT_PATH)
+    p_build.add_argument("--start", type=int, default=1950, help="first year")
+    p_build.add_argument("--end", type=int, default=2100, help="last grid point: Jan 1 of this year")
+    p_build.add_argument("--step-hours", type=float, default=1.0)
+    p_build.add_argument("--ephemeris-path", default=None)
+    p_check = sub.add_parser("check", help="measure the interpolation error against swisseph")
+    p_check.add_argument("path", nargs="?", default=None)
+    p_check.add_argument("--samples", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    import engine  # sets the ephemeris path
+    if args.cmd == "build":
+        if args.ephemeris_path:
+            engine.set_ephemeris_path(args.ephemeris_path)
+        t0 = time.time()
+
+        def progress(done, total):
+            print(f"\r{done}/{total} steps ({time.time() - t0:.0f}s)", end="", file=sys.stderr, flush=True)
+
+        build_table(args.output, args.start, args.end, args.step_hours, progress=progress)
+        print(f"\nwrote {args.output} ({os.path.getsize(args.output) / 2**20:.0f} MB)", file=sys.stderr)
+        return 0
+
+    table = open_table(args.path)
+    if table is None:
+        print("No table found; run: python ephemeris_table.py build", file=sys.stderr)
+        return 1
+    print(f"{table.path}: {table.n_steps} steps x {len(table.bodies)} bodies, swisseph {table.swe_version}")
+    print(f"{'body':<10}{'grid lon':>12}{'grid speed':>12}{'between lon':>13}{'between speed':>15}")
+    for name, row in check_table(table, args.samples).items():
+        print(f"{name:<10}{row['grid_lon']:>12.2e}{row['grid_speed']:>12.2e}"
+              f"{row['between_lon']:>13.2e}{row['between_speed']:>15.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+Offline city geocoding.
+
+A compact city index built from a GeoNames dump (e.g. cities15000.txt from
+https://download.geonames.org/export/dump/) and opened memory-mapped:
+    keys.npy     sorted normalized names (all names + alternate names), fixed-width bytes
+    key_city.npy city row for every key
+    cities.npy   structured rows: name, country, lat, lon, population, timezone id
+    timezones.json
+Names are lowercased, stripped of accents and transliterated (Cyrillic -> Latin),
+so "Москва", "Moskva" and "moscow" all hit; lookups are binary searches on keys.npy.
+
+Nominatim (OpenStreetMap) remains an optional fallback behind a bounded TTL/LRU cache
+and a rate limiter (OSM policy: max. 1 request per second).
+
+Usage:
+    python geocoding.py build cities15000.txt [--out gazetteer] [--min-population 0]
+    python geocoding.py query Москва
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+GAZETTEER_PATH = os.environ.get("ASTROPULSE_GAZETTEER",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer"))
+KEY_BYTES = 48
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_TTL = 24 * 3600     # seconds a Nominatim answer is reused
+NOMINATIM_INTERVAL = 1.0      # min. seconds between Nominatim requests
+NOMINATIM_CACHE_SIZE = 1024   # max. cached answers (least recently used dropped first)
+
+CITY_DTYPE = np.dtype([("name", "S64"), ("country", "S2"), ("lat", "f4"), ("lon", "f4"),
+                       ("population", "i4"), ("tz", "i2")])
+
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z",
+    "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r",
+    "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh",
+    "щ": "shch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    "і": "i", "ї": "yi", "є": "ye", "ґ": "g", "ў": "u",
+}
+_TRANSLIT_TABLE = str.maketrans(TRANSLIT)
+
+
+def normalize(name):
+    """Search key: lowercase, transliterated, without accents/punctuation."""
+    s = name.lower().translate(_TRANSLIT_TABLE)
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = re.sub(r"[^\w]+", " ", s).strip()
+    return s.encode("utf-8")[:KEY_BYTES]
+
+
+# -------------------------------------
+# Index build
+# -------------------------------------
+def build_index(dump_path, out_dir=GAZETTEER_PATH, min_population=0):
+    """Builds the memory-mappable index from a GeoNames cities dump (tab separated)."""
+    cities, keys, key_city, timezones = [], [], [], {}
+    with open(dump_path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 18:
+                continue
+            population = int(cols[14] or 0)
+            if population < min_population:
+                continue
+            row = len(cities)
+            tz = timezones.setdefault(cols[17], len(timezones))
+            cities.append((cols[1].encode("utf-8")[:64], cols[8].encode(), float(cols[4]), float(cols[5]),
+                           min(population, 2**31 - 1), tz))
+            names = {cols[1], cols[2]} | set(filter(None, cols[3].split(",")))
+            for key in {normalize(n) for n in names}:
+                if key:
+                    keys.append(key)
+                    key_city.append(row)
+
+    keys = np.array(keys, dtype=f"S{KEY_BYTES}")
+    key_city = np.array(key_city, dtype=np.int32)
+    order = np.argsort(keys, kind="stable")
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "keys.npy"), keys[order])
+    np.save(os.path.join(out_dir, "key_city.npy"), key_city[order])
+    np.save(os.path.join(out_dir, "cities.npy"), np.array(cities, dtype=CITY_DTYPE))
+    with open(os.path.join(out_dir, "timezones.json"), "w", encoding="utf-8") as f:
+        json.dump(sorted(timezones, key=timezones.get), f)
+    return len(cities), len(keys)
+
+
+# -------------------------------------
+# Lookup
+# -------------------------------------
+class Gazetteer:
+    """Memory-mapped city index; prefix search over normalized names."""
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.keys = np.load(os.path.join(path, "keys.npy"), mmap_mode="r")
+        self.key_city = np.load(os.path.join(path, "key_city.npy"), mmap_mode="r")
+        self.cities = np.load(os.path.join(path, "cities.npy"), mmap_mode="r")
+        with open(os.path.join(path, "timezones.json"), encoding="utf-8") as f:
+            self.timezones = json.load(f)
+
+    def _city(self, row):
+        c = self.cities[row]
+        return {"name": c["name"].decode("utf-8", "replace"), "country": c["country"].decode(),
+                "lat": round(float(c["lat"]), 4), "lon": round(float(c["lon"]), 4),
+                "population": int(c["population"]), "timezone": self.timezones[c["tz"]]}
+
+    def search(self, query, limit=5):
+        """Exact name matches first, then prefix matches; each group by population."""
+        key = normalize(query)
+        if not key:
+            return []
+        lo = np.searchsorted(self.keys, key, side="left")
+        if len(key) == KEY_BYTES:
+            # A full-width key has no room for the sentinel (it would be cut off by the S48 cast)
+            hi = np.searchsorted(self.keys, key, side="right")
+        else:
+            hi = np.searchsorted(self.keys, key + b"\xff", side="left")
+        if lo == hi:
+            return []
+        rows = np.asarray(self.key_city[lo:hi])
+        exact = np.asarray(self.keys[lo:hi]) == key
+        population = self.cities["population"][rows]
+        order = np.lexsort((-population, ~exact))
+        result, seen = [], set()
+        for row in rows[order]:
+            if row not in seen:
+                seen.add(row)
+                result.append(self._city(row))
+                if len(result) == limit:
+                    break
+        return result
+
+
+_gazetteer = None
+
+
+def get_gazetteer():
+    """Process-wide gazetteer (None if no index has been built)."""
+    global _gazetteer
+    if _gazetteer is None and os.path.exists(os.path.join(GAZETTEER_PATH, "keys.npy")):
+        _gazetteer = Gazetteer(GAZETTEER_PATH)
+    return _gazetteer
+
+
+# -------------------------------------
+# Nominatim fallback
+# -------------------------------------
+_nominatim_cache = OrderedDict()  # key -> (expires, answer), in LRU order
+_nominatim_lock = threading.Lock()
+_nominatim_last = 0.0
+
+
+def get_coordinates_osm(city_name):
+    """
+    Fetches coordinates for a city using OpenStreetMap Nominatim API.
+    Returns (lat, lon) or None if not found.
+    User-Agent is required by OSM policy. Answers are cached for NOMINATIM_TTL (at most
+    NOMINATIM_CACHE_SIZE of them) and requests are spaced by NOMINATIM_INTERVAL.
+    """
+    global _nominatim_last
+    import requests
+
+    key = city_name.strip().lower()
+    with _nominatim_lock:
+        hit = _nominatim_cache.get(key)
+        if hit and hit[0] > time.time():
+            _nominatim_cache.move_to_end(key)
+            return hit[1]
+        # Rate limit: reserve the next free slot under the lock, wait for it outside, so
+        # concurrent sessions queue up without holding the lock during the request
+        slot = max(time.time(), _nominatim_last + NOMINATIM_INTERVAL)
+        _nominatim_last = slot
+    wait = slot - time.time()
+    if wait > 0:
+        time.sleep(wait)
+
+    result = None
+    try:
+        params = {
+            "q": city_name,
+            "format": "json",
+            "limit": 1
+        }
+        headers = {
+            "User-Agent": "AstroPulseDesktop/1.0"
+        }
+        response = requests.get(NOMINATIM_URL, params=params, headers=headers, timeout=5)
+        if response.status_code == 200:
+            data = response.json()
+            if data:
+                result = float(data[0]["lat"]), float(data[0]["lon"])
+    except Exception as e:
+        print(f"Geocoding error: {e}")
+        return None  # network errors are not cached
+    with _nominatim_lock:
+        now = time.time()
+        for stale in [k for k, (expires, _) in _nominatim_cache.items() if expires <= now]:
+            del _nominatim_cache[stale]
+        _nominatim_cache[key] = (now + NOMINATIM_TTL, result)
+        _nominatim_cache.move_to_end(key)
+        while len(_nominatim_cache) > NOMINATIM_CACHE_SIZE:
+            _nominatim_cache.popitem(last=False)
+    return result
+
+
+def geocode(city_name, online=True):
+    """
+    Offline gazetteer first, Nominatim as fallback.
+    Returns {"name", "lat", "lon", "timezone" (None from Nominatim), ...} or None.
+    """
+    gazetteer = get_gazetteer()
+    if gazetteer is not None:
+        found = gazetteer.search(city_name, limit=1)
+        if found:
+            return found[0]
+    if online:
+        coords = get_coordinates_osm(city_name)
+        if coords:
+            return {"name": city_name, "lat": coords[0], "lon": coords[1], "timezone": None}
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AstroPulse offline gazetteer")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="build the index from a GeoNames dump")
+    p_build.add_argument("dump")
+    p_build.add_argument("--out", default=GAZETTEER_PATH)
+    p_build.add_argument("--min-population", type=int, default=0)
+    p_query = sub.add_parser("query", help="search the index")
+    p_query.add_argument("name")
+    p_query.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        n_cities, n_keys = build_index(args.dump, args.out, args.min_population)
+        print(f"{n_cities} cities, {n_keys} names -> {args.out}")
+        return 0
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        print(f"No index at {GAZETTEER_PATH}; run: python geocoding.py build cities15000.txt", file=sys.stderr)
+        return 1
+    for city in gazetteer.search(args.name, args.limit):
+        print(json.dumps(city, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
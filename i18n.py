@@ -15,7 +15,11 @@ TRANSLATIONS = {
         "detailed_settings": "Детальные настройки",
         "orbis": "Орбис",
         "min_duration": "Мин. длительность (часов)",
+        "pulse_resolution": "Шаг графика пульса (часов)",
+        "pulse_auto": "авто",
+        "house_system": "Система домов",
         "planets": "Планеты",
+        "natal_points": "Натальные точки",
         "aspects": "Аспекты",
         "calculate": "Рассчитать",
         "analyzing": "Анализ звездного неба...",
@@ -34,6 +38,11 @@ TRANSLATIONS = {
         "calculate_to_see": "👈 Нажмите 'Рассчитать' в меню слева, чтобы увидеть магию.",
         "no_aspects_found": "В выбранном периоде аспектов не найдено. Попробуйте расширить диапазон дат.",
         "donate": "☕ Поддержать автора (Boosty)",
+        "lifetime": "Транзиты всей жизни",
+        "lifetime_timeline": "Транзиты медленных планет за всю жизнь",
+        "exact_hits": "Точных касаний",
+        "page": "Страница",
+        "zoom": "Период на графиках",
     },
     "en": {
         "page_title": "AstroPulse Desktop — Transit Forecast",
@@ -51,7 +60,11 @@ TRANSLATIONS = {
         "detailed_settings": "Advanced Settings",
         "orbis": "Orbis",
         "min_duration": "Min Duration (hours)",
+        "pulse_resolution": "Pulse Chart Step (hours)",
+        "pulse_auto": "auto",
+        "house_system": "House System",
         "planets": "Planets",
+        "natal_points": "Natal Points",
         "aspects": "Aspects",
         "calculate": "Calculate",
         "analyzing": "Analyzing the stars...",
@@ -70,5 +83,10 @@ TRANSLATIONS = {
         "calculate_to_see": "👈 Click 'Calculate' in the sidebar to see the magic.",
         "no_aspects_found": "No aspects found in the selected period. Try expanding the date range.",
         "donate": "☕ Donate to Author (Boosty)",
+        "lifetime": "Lifetime transits",
+        "lifetime_timeline": "Slow-planet transits over a lifetime",
+        "exact_hits": "Exact hits",
+        "page": "Page",
+        "zoom": "Chart range",
     }
 }
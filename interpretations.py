@@ -1,3 +1,6 @@
+import functools
+import zlib
+
 # -------------------------------------
 # DATA & INTERPRETATIONS (База знаний)
 # -------------------------------------
@@ -14,7 +17,15 @@ KEYWORDS = {
         "Saturn": "Ограничение, Дисциплина, Уроки",
         "Uranus": "Внезапность, Революция, Свобода",
         "Neptune": "Иллюзии, Вдохновение, Хаос",
-        "Pluto": "Трансформация, Власть, Кризис"
+        "Pluto": "Трансформация, Власть, Кризис",
+        "North Node": "Судьба, Путь развития, Новые связи",
+        "Chiron": "Рана, Исцеление, Наставничество",
+        "Ceres": "Забота, Питание, Семья",
+        "Pallas": "Мудрость, Стратегия, Мастерство",
+        "Juno": "Брак, Договоры, Верность",
+        "Vesta": "Служение, Фокус, Призвание",
+        "Ascendant": "Внешность, Самоподача, Начинания",
+        "MC": "Карьера, Цели, Репутация"
     },
     "en": {
         "Sun": "Willpower, Ego, Vital Energy",
@@ -26,7 +37,15 @@ KEYWORDS = {
         "Saturn": "Restriction, Discipline, Lessons",
         "Uranus": "Suddenness, Revolution, Freedom",
         "Neptune": "Illusions, Inspiration, Chaos",
-        "Pluto": "Transformation, Power, Crisis"
+        "Pluto": "Transformation, Power, Crisis",
+        "North Node": "Destiny, Path of Growth, New Connections",
+        "Chiron": "Wound, Healing, Mentoring",
+        "Ceres": "Care, Nourishment, Family",
+        "Pallas": "Wisdom, Strategy, Craft",
+        "Juno": "Marriage, Contracts, Loyalty",
+        "Vesta": "Devotion, Focus, Vocation",
+        "Ascendant": "Appearance, Self-Presentation, Beginnings",
+        "MC": "Career, Goals, Reputation"
     }
 }
 
@@ -125,6 +144,51 @@ TEMPLATES = {
     }
 }
 
+RARITY_MAP = {
+    "ru": {
+        "Sun": "1 раз в год", "Mercury": "1 раз в год", "Venus": "1 раз в год",
+        "Mars": "1 раз в 2 года", "Jupiter": "1 раз в 12 лет", "Saturn": "1 раз в 29 лет",
+        "Uranus": "1 раз в 84 года", "Neptune": "1 раз в 165 лет", "Pluto": "1 раз в 248 лет",
+        "North Node": "1 раз в 18,6 лет", "Chiron": "1 раз в 50 лет", "Ceres": "1 раз в 4-5 лет",
+        "Pallas": "1 раз в 4-5 лет", "Juno": "1 раз в 4-5 лет", "Vesta": "1 раз в 3-4 года"
+    },
+    "en": {
+        "Sun": "Once a year", "Mercury": "Once a year", "Venus": "Once a year",
+        "Mars": "Once in 2 years", "Jupiter": "Once in 12 years", "Saturn": "Once in 29 years",
+        "Uranus": "Once in 84 years", "Neptune": "Once in 165 years", "Pluto": "Once in 248 years",
+        "North Node": "Once in 18.6 years", "Chiron": "Once in 50 years", "Ceres": "Once in 4-5 years",
+        "Pallas": "Once in 4-5 years", "Juno": "Once in 4-5 years", "Vesta": "Once in 3-4 years"
+    }
+}
+
+
+# -------------------------------------
+# Compiled per-language tables
+# -------------------------------------
+class _Language:
+    """Everything get_interpretation needs for one language, with the "ru" fallbacks resolved."""
+
+    def __init__(self, lang):
+        self.db = dict(INTERPRETATIONS_DB["ru"], **INTERPRETATIONS_DB.get(lang, {}))
+        self.templates = {nature: tuple(t.format for t in templates)
+                          for nature, templates in TEMPLATES.get(lang, TEMPLATES["ru"]).items()}
+        self.keywords = KEYWORDS.get(lang, KEYWORDS["ru"])
+        self.houses = HOUSE_KEYWORDS.get(lang, HOUSE_KEYWORDS["ru"])
+        self.rarity = RARITY_MAP.get(lang, RARITY_MAP["ru"])
+
+
+_LANGUAGES = {lang: _Language(lang) for lang in TEMPLATES}
+
+
+def _language(lang):
+    return _LANGUAGES.get(lang) or _LANGUAGES["ru"]
+
+
+def stable_hash(text):
+    """Process-independent string hash (unlike the salted hash())."""
+    return zlib.crc32(text.encode("utf-8"))
+
+
 def get_aspect_nature(aspect, t_planet):
     if aspect in ["Square", "Opposition"]: return "Tense"
     if aspect in ["Trine", "Sextile"]: return "Harmonic"
@@ -133,45 +197,31 @@ def get_aspect_nature(aspect, t_planet):
         return "Neutral"
     return "Neutral"
 
+@functools.lru_cache(maxsize=8192)
 def get_interpretation(t_name, aspect, n_name, t_house=None, n_house=None, lang="ru"):
     key = f"{t_name} {aspect} {n_name}"
+    compiled = _language(lang)
     
     # 1. Search in DB
-    db = INTERPRETATIONS_DB.get(lang, INTERPRETATIONS_DB["ru"])
-    if key in db: return db[key]
-    if lang != "ru" and key in INTERPRETATIONS_DB["ru"]: return INTERPRETATIONS_DB["ru"][key]
+    if key in compiled.db: return compiled.db[key]
     
     # 2. Generator
-    nature = get_aspect_nature(aspect, t_name)
-    lang_templates = TEMPLATES.get(lang, TEMPLATES["ru"])
+    templates = compiled.templates[get_aspect_nature(aspect, t_name)]
     
-    t_desc = KEYWORDS.get(lang, KEYWORDS["ru"]).get(t_name, t_name)
-    n_desc = KEYWORDS.get(lang, KEYWORDS["ru"]).get(n_name, n_name)
+    t_desc = compiled.keywords.get(t_name, t_name)
+    n_desc = compiled.keywords.get(n_name, n_name)
     
-    h_db = HOUSE_KEYWORDS.get(lang, HOUSE_KEYWORDS["ru"])
-    t_house_desc = h_db.get(t_house, f"{t_house} house") if t_house else "Transit"
-    n_house_desc = h_db.get(n_house, f"{n_house} house") if n_house else "Natal"
+    t_house_desc = compiled.houses.get(t_house, f"{t_house} house") if t_house else "Transit"
+    n_house_desc = compiled.houses.get(n_house, f"{n_house} house") if n_house else "Natal"
     
-    idx = hash(key + str(t_house) + str(n_house)) % len(lang_templates[nature])
-    template = lang_templates[nature][idx]
+    # Same text for the same aspect and houses in every process / worker
+    idx = stable_hash(f"{key}|{t_house}|{n_house}") % len(templates)
     
-    return template.format(
+    return templates[idx](
         t_name=t_name, n_name=n_name, 
         t_desc=t_desc, n_desc=n_desc,
         t_house_desc=t_house_desc, n_house_desc=n_house_desc
     )
 
 def get_planet_rarity(t_name, lang="ru"):
-    rarity_map = {
-        "ru": {
-            "Sun": "1 раз в год", "Mercury": "1 раз в год", "Venus": "1 раз в год",
-            "Mars": "1 раз в 2 года", "Jupiter": "1 раз в 12 лет", "Saturn": "1 раз в 29 лет",
-            "Uranus": "1 раз в 84 года", "Neptune": "1 раз в 165 лет", "Pluto": "1 раз в 248 лет"
-        },
-        "en": {
-            "Sun": "Once a year", "Mercury": "Once a year", "Venus": "Once a year",
-            "Mars": "Once in 2 years", "Jupiter": "Once in 12 years", "Saturn": "Once in 29 years",
-            "Uranus": "Once in 84 years", "Neptune": "Once in 165 years", "Pluto": "Once in 248 years"
-        }
-    }
-    return rarity_map.get(lang, rarity_map["ru"]).get(t_name, None)
+    return _language(lang).rarity.get(t_name, None)
@@ -0,0 +1,98 @@
+"""
+Load test for the AstroPulse HTTP API.
+
+Fires requests at a running api.py instance from N concurrent clients and reports
+throughput and latency percentiles. Exits with status 1 if p99 exceeds --target-ms.
+
+Usage:
+    python api.py --port 8080 &
+    python loadtest.py --url http://127.0.0.1:8080 --requests 500 --concurrency 50 --charts 100
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import aiohttp
+
+from api import ENDPOINTS, NATAL_FIELDS
+
+
+def random_chart(rng):
+    return {
+        "date": f"{rng.randint(1950, 2005)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "time": f"{rng.randint(0, 23)}:{rng.randint(0, 59):02d}",
+        "tz": "Europe/Moscow",
+        "lat": round(rng.uniform(-60, 60), 2),
+        "lon": round(rng.uniform(-180, 180), 2),
+        "start": "2026-01-01", "end": "2026-01-31",
+    }
+
+
+def request_body(rng, kind, charts):
+    """Body for one request: a chart, or for /group a few charts under the shared window."""
+    if kind != "group":
+        return rng.choice(charts)
+    members = rng.sample(charts, min(len(charts), rng.randint(2, 4)))
+    shared = {k: v for k, v in members[0].items() if k not in NATAL_FIELDS}
+    return dict(shared, charts=[{k: m[k] for k in NATAL_FIELDS if k in m} for m in members])
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    # A limited pool of charts, so repeated queries exercise the cache and coalescing
+    charts = [random_chart(rng) for _ in range(args.charts)]
+    jobs = [(kind, request_body(rng, kind, charts)) for kind in rng.choices(ENDPOINTS, k=args.requests)]
+    latencies, failures = [], 0
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def client(session):
+        nonlocal failures
+        while not queue.empty():
+            kind, chart = queue.get_nowait()
+            t0 = time.perf_counter()
+            try:
+                async with session.post(f"{args.url}/{kind}", json=chart) as resp:
+                    await resp.read()
+                    if resp.status != 200:
+                        failures += 1
+            except aiohttp.ClientError:
+                failures += 1
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t_start = time.perf_counter()
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=args.timeout)) as session:
+        await asyncio.gather(*(client(session) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - t_start
+
+    p50, p95, p99 = (percentile(latencies, q) for q in (50, 95, 99))
+    print(f"{len(latencies)} requests, {failures} failed, {elapsed:.1f}s, {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency ms: p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f}  max {max(latencies):.1f}")
+    if args.target_ms and p99 > args.target_ms:
+        print(f"p99 {p99:.1f} ms exceeds target {args.target_ms:.0f} ms")
+        return 1
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AstroPulse API load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--charts", type=int, default=100, help="distinct natal charts in the request mix")
+    parser.add_argument("--target-ms", type=float, default=0, help="fail if p99 latency exceeds this")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Level-of-detail reduction for the Plotly charts.
+
+The browser only has a few hundred to ~2000 pixels per chart, so long forecasts are
+reduced server-side before they are sent:
+    - pulse series: LTTB (Largest-Triangle-Three-Buckets, keeps the visual shape) or
+      min-max per bucket (keeps every extreme) down to ~2 points per pixel
+    - timeline: runs of intervals shorter than a couple of pixels (the Moon) on the same
+      planet pair are merged into one bar that carries the number of merged intervals
+Both work on the currently viewed date range, so zooming in re-renders finer detail.
+"""
+import numpy as np
+import pandas as pd
+
+VIEWPORT_PX = 1200         # assumed chart width; Streamlit does not report the browser's
+MIN_BAR_PX = 2.0           # bars shorter than this are merged with their neighbours ...
+MERGE_GAP_PX = 6.0         # ... on the same planet pair when less than this apart
+MIXED_ASPECT = "Mixed"     # aspect of a merged bar with different aspects
+
+
+# -------------------------------------
+# Series
+# -------------------------------------
+def lttb(x, y, n_out: int) -> np.ndarray:
+    """Indices of n_out points picked by Largest-Triangle-Three-Buckets (first and last kept)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 inner buckets
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # Average of the next bucket (the last point for the last bucket)
+        n_lo, n_hi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        cx, cy = x[n_lo:n_hi].mean(), y[n_lo:n_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = out[b + 1] = lo + int(np.argmax(area))
+    return out
+
+
+def minmax(y, n_buckets: int) -> np.ndarray:
+    """Sorted indices of the minimum and maximum of each of n_buckets equal buckets."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    padded = np.pad(y, (0, size * n_buckets - n), mode="edge").reshape(n_buckets, size)
+    base = np.arange(n_buckets) * size
+    idx = np.concatenate([base + padded.argmin(axis=1), base + padded.argmax(axis=1), [0, n - 1]])
+    return np.unique(np.minimum(idx, n - 1))
+
+
+def downsample(x, y, n_out: int = 2 * VIEWPORT_PX, method: str = "lttb") -> np.ndarray:
+    """Indices of the points to draw ("lttb" or "minmax")."""
+    if method == "minmax":
+        return minmax(y, max(1, n_out // 2))
+    if method != "lttb":
+        raise ValueError(f"Unknown downsampling method: {method}")
+    x = pd.DatetimeIndex(x).asi8 if isinstance(x, pd.DatetimeIndex) else x
+    return lttb(x, y, n_out)
+
+
+def view_slice(index: pd.DatetimeIndex, start, end) -> slice:
+    """Positions of index inside [start, end], one sample of context on each side."""
+    i0 = max(0, int(index.searchsorted(start, side="left")) - 1)
+    i1 = min(len(index), int(index.searchsorted(end, side="right")) + 1)
+    return slice(i0, i1)
+
+
+# -------------------------------------
+# Timeline
+# -------------------------------------
+def _ns(values) -> np.ndarray:
+    return pd.DatetimeIndex(values).as_unit("ns").asi8
+
+
+def aggregate_intervals(df: pd.DataFrame, view_start, view_end, width_px: int = VIEWPORT_PX,
+                        min_px: float = MIN_BAR_PX, gap_px: float = MERGE_GAP_PX,
+                        keys=("transiting", "natal")) -> pd.DataFrame:
+    """
+    Intervals overlapping [view_start, view_end] with dense short bars merged.
+    Consecutive intervals of one planet pair that are each shorter than min_px pixels and
+    less than gap_px pixels apart become one bar (aspect: the common one or MIXED_ASPECT,
+    score: sum). Adds "count" (intervals per bar); other columns of merged bars are dropped.
+    """
+    df = df[(df["end"] >= view_start) & (df["start"] <= view_end)]
+    px_ns = (pd.Timestamp(view_end) - pd.Timestamp(view_start)).value / width_px
+    duration = _ns(df["end"]) - _ns(df["start"])
+    short = duration < min_px * px_ns
+    if short.sum() < 2:
+        return df.assign(count=1)
+
+    s = df[short].astype({k: str for k in keys + ("aspect",)}).sort_values(list(keys) + ["start"])
+    start, end = _ns(s["start"]), _ns(s["end"])
+    pair = s.groupby(list(keys), sort=False).ngroup().to_numpy()
+    new = np.ones(len(s), dtype=bool)
+    new[1:] = (pair[1:] != pair[:-1]) | (start[1:] - end[:-1] >= gap_px * px_ns)
+    runs = s.groupby(np.cumsum(new), sort=False)
+    merged = runs.agg(**{k: (k, "first") for k in keys}, aspect=("aspect", "first"), n_aspects=("aspect", "nunique"),
+                      start=("start", "min"), end=("end", "max"), score=("score", "sum"), count=("start", "size"))
+    merged.loc[merged["n_aspects"] > 1, "aspect"] = MIXED_ASPECT
+
+    long = df[~short].astype({k: str for k in keys + ("aspect",)}).assign(count=1)
+    return pd.concat([long, merged.drop(columns="n_aspects")], ignore_index=True)
@@ -0,0 +1,303 @@
+"""
+Lightweight hot-path instrumentation.
+
+Off by default; when enabled:
+    - swe.calc_ut / swe.houses are wrapped with call counters
+    - span("name") / @timed("name") record durations into histograms
+    - render_prometheus() gives the Prometheus text format (api.py: GET /metrics,
+      Streamlit: serve_http() on ASTROPULSE_METRICS_PORT), log_summary() log lines
+    - RequestProfiler / profile() profile one request (pyinstrument sampling
+      profiler if installed, cProfile otherwise)
+Disabled, the swisseph functions are the originals and a span costs one flag check.
+
+Configuration (environment):
+    ASTROPULSE_METRICS       - "1" to enable at import
+    ASTROPULSE_METRICS_PORT  - port for serve_http() (Streamlit process)
+    ASTROPULSE_METRICS_HOST  - interface for serve_http() (default 127.0.0.1; 0.0.0.0 to expose it)
+"""
+import bisect
+import functools
+import io
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import swisseph as swe
+
+log = logging.getLogger("astropulse.metrics")
+
+PREFIX = "astropulse"
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SWE_FUNCTIONS = ("calc_ut", "houses")
+
+_enabled = False
+_lock = threading.Lock()
+_counters = defaultdict(int)                                 # (name, label) -> value
+_spans = defaultdict(lambda: [0, 0.0, [0] * len(BUCKETS)])  # span -> [count, sum, bucket counts]
+_collectors = []                                             # fn() -> {gauge name: {label: value}}
+_originals = {}
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable() -> None:
+    """Turns instrumentation on and wraps the swisseph hot functions."""
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        for fn in SWE_FUNCTIONS:
+            _originals[fn] = orig = getattr(swe, fn)
+            setattr(swe, fn, _counted(fn, orig))
+        _enabled = True
+
+
+def disable() -> None:
+    """Restores the original swisseph functions (recorded values are kept)."""
+    global _enabled
+    with _lock:
+        for fn, orig in _originals.items():
+            setattr(swe, fn, orig)
+        _originals.clear()
+        _enabled = False
+
+
+def _counted(name, fn):
+    key = ("swe_calls_total", name)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        _counters[key] += 1  # no lock on the hot path; a rare lost increment between threads is acceptable
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+# -------------------------------------
+# Recording
+# -------------------------------------
+def inc(name: str, label: str = "", value: int = 1) -> None:
+    if _enabled:
+        _counters[name, label] += value
+
+
+def observe(span_name: str, seconds: float) -> None:
+    with _lock:
+        entry = _spans[span_name]
+        entry[0] += 1
+        entry[1] += seconds
+        i = bisect.bisect_left(BUCKETS, seconds)
+        if i < len(BUCKETS):
+            entry[2][i] += 1
+    log.info("span %s %.1f ms", span_name, seconds * 1000)
+
+
+@contextmanager
+def span(name: str):
+    """Times the block into the span histogram (no-op while disabled)."""
+    if not _enabled:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0)
+
+
+def timed(name: str):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - t0)
+        return wrapper
+    return decorator
+
+
+def register_collector(fn) -> None:
+    """fn() -> {gauge name: {label: value}}, evaluated on every render."""
+    _collectors.append(fn)
+
+
+# -------------------------------------
+# Transfer between processes (worker pools)
+# -------------------------------------
+def drain() -> dict:
+    """Snapshot of counters/spans recorded so far, then reset (worker side)."""
+    with _lock:
+        snap = {"counters": [[n, l, v] for (n, l), v in _counters.items()],
+                "spans": {k: [c, s, list(b)] for k, (c, s, b) in _spans.items()}}
+        _counters.clear()
+        _spans.clear()
+    return snap
+
+
+def merge(snapshot: dict) -> None:
+    """Adds a drain() snapshot from another process."""
+    with _lock:
+        for name, label, value in snapshot["counters"]:
+            _counters[name, label] += value
+        for name, (count, total, buckets) in snapshot["spans"].items():
+            entry = _spans[name]
+            entry[0] += count
+            entry[1] += total
+            entry[2] = [a + b for a, b in zip(entry[2], buckets)]
+
+
+def reset() -> None:
+    drain()
+
+
+# -------------------------------------
+# Export
+# -------------------------------------
+def _fmt(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """Prometheus text exposition format (v0.0.4)."""
+    with _lock:
+        counters = dict(_counters)
+        spans = {k: (c, s, list(b)) for k, (c, s, b) in _spans.items()}
+    lines = []
+    by_name = defaultdict(list)
+    for (name, label), value in sorted(counters.items()):
+        by_name[name].append((label, value))
+    for name, values in by_name.items():
+        lines.append(f"# TYPE {PREFIX}_{name} counter")
+        label_key = "fn" if name == "swe_calls_total" else "label"
+        for label, value in values:
+            labels = f'{{{label_key}="{label}"}}' if label else ""
+            lines.append(f"{PREFIX}_{name}{labels} {value}")
+
+    if spans:
+        lines.append(f"# TYPE {PREFIX}_span_seconds histogram")
+        for name, (count, total, buckets) in sorted(spans.items()):
+            cumulative = 0
+            for le, n in zip(BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'{PREFIX}_span_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{PREFIX}_span_seconds_bucket{{span="{name}",le="+Inf"}} {count}')
+            lines.append(f'{PREFIX}_span_seconds_sum{{span="{name}"}} {total!r}')
+            lines.append(f'{PREFIX}_span_seconds_count{{span="{name}"}} {count}')
+
+    for collector in _collectors:
+        for gauge, values in collector().items():
+            lines.append(f"# TYPE {PREFIX}_{gauge} gauge")
+            for label, value in values.items():
+                lines.append(f'{PREFIX}_{gauge}{{stat="{label}"}} {_fmt(value)}')
+    return "\n".join(lines) + "\n"
+
+
+def log_summary(level: int = logging.INFO) -> None:
+    """One log line per counter and span (count, total and mean time)."""
+    with _lock:
+        counters = dict(_counters)
+        spans = {k: (c, s) for k, (c, s, _) in _spans.items()}
+    for (name, label), value in sorted(counters.items()):
+        log.log(level, "counter %s%s=%d", name, f"[{label}]" if label else "", value)
+    for name, (count, total) in sorted(spans.items()):
+        log.log(level, "span %s count=%d total=%.3fs mean=%.1fms", name, count, total, total / count * 1000)
+
+
+def serve_http(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Background /metrics endpoint for processes without their own web server."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
+
+
+# -------------------------------------
+# Profiler
+# -------------------------------------
+_active = threading.local()  # profiler running in this thread (one Streamlit session run)
+
+
+class RequestProfiler:
+    """
+    Per-request profiler: pyinstrument (sampling) if installed, else cProfile
+    (deterministic, sorted by cumulative time). start()/stop() -> text report.
+    """
+
+    def __init__(self, limit: int = 40):
+        self.limit = limit
+        self._profiler = None
+
+    def start(self) -> "RequestProfiler":
+        # A run aborted by an exception (e.g. st.rerun) in this thread never reached stop();
+        # profilers of other sessions' threads are left alone
+        previous = getattr(_active, "profiler", None)
+        if previous is not None:
+            previous.stop()
+        try:
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self._profiler.start()
+        except ImportError:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        _active.profiler = self
+        return self
+
+    def stop(self) -> str:
+        if getattr(_active, "profiler", None) is self:
+            _active.profiler = None
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return ""
+        if hasattr(profiler, "output_text"):
+            profiler.stop()
+            return profiler.output_text()
+        import pstats
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(self.limit)
+        return out.getvalue()
+
+
+class _Report:
+    text = ""
+
+
+@contextmanager
+def profile(active: bool = True, limit: int = 40):
+    """Profiles the block; the yielded object's .text holds the report afterwards."""
+    report = _Report()
+    if not active:
+        yield report
+        return
+    profiler = RequestProfiler(limit).start()
+    try:
+        yield report
+    finally:
+        report.text = profiler.stop()
+
+
+if os.environ.get("ASTROPULSE_METRICS") == "1":
+    enable()
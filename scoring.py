@@ -0,0 +1,210 @@
+"""
+Scoring model: the weights behind an aspect's peak score, from a versioned JSON config.
+
+    peak score = base x planet weight x planet rarity
+    base       = conjunction score of the transiting planet for conjunctions, else the aspect nature
+
+The weights live in scoring.json (or $ASTROPULSE_SCORING) so they can be tuned without code
+changes; engine compiles them once into a dense (point x aspect) peak-score matrix and
+every score is a gather from it.
+
+Config keys:
+    format              FORMAT_VERSION of the file layout
+    version             content version, bump on every edit (reported by the API /health)
+    planet_weights, planet_rarity, conjunction_scores   transiting body name -> value
+    aspect_nature       aspect name -> base score (conjunctions use conjunction_scores)
+    defaults            planet_weight, planet_rarity, conjunction_score, aspect_nature for
+                        names missing from the tables
+
+Hot reload: get_model() stats the file at most every RELOAD_CHECK_SECONDS and reloads it
+when it changed. Each load gets a new revision (engine recompiles its matrix on the next
+score) and the on_reload() callbacks run (the API clears its result cache). A config that
+fails to load on reload is logged and the previous model stays in use.
+
+Usage:
+    python scoring.py check [path]     # validate and print the peak-score matrix
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+FORMAT_VERSION = 1
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring.json")
+RELOAD_CHECK_SECONDS = 1.0
+TABLES = ("planet_weights", "planet_rarity", "conjunction_scores", "aspect_nature")
+DEFAULTS = {"planet_weight": 10.0, "planet_rarity": 1.0, "conjunction_score": 0.0, "aspect_nature": 0.0}
+
+log = logging.getLogger("astropulse.scoring")
+
+
+@dataclass(frozen=True)
+class ScoringModel:
+    """One loaded config; revision counts the loads in this process (key for compiled tables)."""
+    version: int
+    revision: int
+    path: str
+    mtime_ns: int
+    planet_weights: Dict[str, float]
+    planet_rarity: Dict[str, float]
+    conjunction_scores: Dict[str, float]
+    aspect_nature: Dict[str, float]
+    defaults: Dict[str, float]
+
+    @property
+    def stamp(self):
+        """(path, mtime_ns): names the loaded file across processes (revision is per process)."""
+        return self.path, self.mtime_ns
+
+    def peak_matrix(self, point_names: Sequence[str], aspect_names: Sequence[str]) -> np.ndarray:
+        """[point, aspect] peak scores for the given name lists."""
+        d = self.defaults
+        weight = np.array([self.planet_weights.get(p, d["planet_weight"]) for p in point_names], dtype=float)
+        rarity = np.array([self.planet_rarity.get(p, d["planet_rarity"]) for p in point_names], dtype=float)
+        conj = np.array([self.conjunction_scores.get(p, d["conjunction_score"]) for p in point_names], dtype=float)
+        nature = np.array([self.aspect_nature.get(a, d["aspect_nature"]) for a in aspect_names], dtype=float)
+        is_conj = np.array([a == "Conjunction" for a in aspect_names])
+        base = np.where(is_conj[None, :], conj[:, None], nature[None, :])
+        return base * weight[:, None] * rarity[:, None]
+
+    def unknown_names(self, point_names: Sequence[str], aspect_names: Sequence[str]) -> List[str]:
+        """Table keys that match no point / aspect (typos; they never apply)."""
+        points, aspects = set(point_names), set(aspect_names) - {"Conjunction"}
+        unknown = [f"{table}.{name}" for table in TABLES[:3] for name in getattr(self, table) if name not in points]
+        return unknown + [f"aspect_nature.{name}" for name in self.aspect_nature if name not in aspects]
+
+
+def _number_table(raw: dict, key: str, path: str) -> Dict[str, float]:
+    table = raw.get(key, {})
+    if not isinstance(table, dict):
+        raise ValueError(f"{path}: {key} must be an object")
+    for name, value in table.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"{path}: {key}.{name} must be a finite number, got {value!r}")
+    return {name: float(value) for name, value in table.items()}
+
+
+def load_model(path: str, revision: int = 0) -> ScoringModel:
+    """Reads and validates a scoring config (ValueError on a bad file)."""
+    mtime_ns = os.stat(path).st_mtime_ns
+    with open(path, encoding="utf-8") as f:
+        try:
+            raw = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: {e}") from None
+    if not isinstance(raw, dict):
+        raise ValueError(f"{path}: expected a JSON object")
+    if raw.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path}: scoring format {raw.get('format')}, expected {FORMAT_VERSION}")
+    version = raw.get("version")
+    if isinstance(version, bool) or not isinstance(version, int):
+        raise ValueError(f"{path}: version must be an integer")
+    defaults = dict(DEFAULTS, **_number_table(raw, "defaults", path))
+    unknown = set(defaults) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"{path}: unknown defaults: {', '.join(sorted(unknown))}")
+    return ScoringModel(version, revision, path, mtime_ns, *(_number_table(raw, t, path) for t in TABLES), defaults)
+
+
+# -------------------------------------
+# Current model (hot reload)
+# -------------------------------------
+_model: Optional[ScoringModel] = None
+_checked = 0.0                  # time.monotonic() of the last stat
+_failed = None                  # (path, mtime_ns) of a config that failed to load
+_revision = 0
+_callbacks: List[Callable[[ScoringModel], None]] = []
+_lock = threading.RLock()
+
+
+def scoring_path() -> str:
+    return os.environ.get("ASTROPULSE_SCORING") or DEFAULT_PATH
+
+
+def on_reload(callback: Callable[[ScoringModel], None]) -> None:
+    """Registers callback(model), called after every (re)load that replaced the model."""
+    _callbacks.append(callback)
+
+
+def reload(path: Optional[str] = None) -> ScoringModel:
+    """Loads the config now and makes it current (errors propagate, the old model stays)."""
+    global _model, _revision, _failed
+    with _lock:
+        model = load_model(path or scoring_path(), _revision + 1)
+        _model, _revision, _failed = model, model.revision, None
+        for callback in _callbacks:
+            callback(model)
+        return model
+
+
+def get_model() -> ScoringModel:
+    """The current model; picks up a changed config file (checked every RELOAD_CHECK_SECONDS)."""
+    global _checked, _failed
+    model, now = _model, time.monotonic()
+    if model is not None and now - _checked < RELOAD_CHECK_SECONDS:
+        return model
+    with _lock:
+        if _model is None:
+            return reload()
+        _checked = now
+        path = scoring_path()
+        try:
+            stamp = (path, os.stat(path).st_mtime_ns)
+        except OSError as e:
+            stamp = (path, None)
+            if stamp != _failed:
+                log.warning("scoring config unavailable, keeping version %s: %s", _model.version, e)
+            _failed = stamp
+            return _model
+        if stamp in (_failed, (_model.path, _model.mtime_ns)):
+            return _model
+        try:
+            model = reload(path)
+        except (OSError, ValueError) as e:
+            log.warning("scoring config not reloaded, keeping version %s: %s", _model.version, e)
+            _failed = stamp
+            return _model
+        log.info("scoring config %s reloaded: version %s", path, model.version)
+        return model
+
+
+# -------------------------------------
+# CLI
+# -------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AstroPulse scoring config")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_check = sub.add_parser("check", help="validate a config and print its peak-score matrix")
+    p_check.add_argument("path", nargs="?", default=None)
+    args = parser.parse_args(argv)
+
+    import engine  # point / aspect names
+    path = args.path or scoring_path()
+    try:
+        model = load_model(path)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    names = [name for _, name in engine.ALL_BODIES]
+    matrix = model.peak_matrix(names, engine.ASPECT_NAMES)
+    print(f"{path}: version {model.version}")
+    print(f"{'':<12}" + "".join(f"{a:>12}" for a in engine.ASPECT_NAMES))
+    for name, row in zip(names, matrix):
+        print(f"{name:<12}" + "".join(f"{v:>12.1f}" for v in row))
+    unknown = model.unknown_names(engine.POINT_NAMES, engine.ASPECT_NAMES)
+    if unknown:
+        print(f"unknown names (ignored): {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""batch.py --resume after interrupted runs."""
+import collections
+import json
+import os
+
+import pytest
+
+import batch
+
+RECORDS = [{"id": str(i), "date": f"19{70 + i}-05-01", "lat": 50, "lon": 30} for i in range(5)]
+RECORDS[2]["date"] = "1972-13-01"  # error record
+
+
+def _run(tmp_path, output, *extra):
+    args = [str(tmp_path / "in.jsonl"), "-o", str(output), "--start", "2026-01-01", "--end", "2026-01-03",
+            "--workers", "1", "--flush-every", "2", *extra]
+    return batch.main(args)
+
+
+@pytest.fixture
+def records(tmp_path):
+    with open(tmp_path / "in.jsonl", "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in RECORDS)
+    return tmp_path
+
+
+def test_resume_torn_jsonl_line(records):
+    output = records / "out.jsonl"
+    _run(records, output)
+    # Crash: torn last line, the checkpoint misses the last flush
+    data = output.read_bytes()
+    output.write_bytes(data[:-30])
+    checkpoint = records / "out.jsonl.checkpoint"
+    checkpoint.write_text("".join(checkpoint.read_text().splitlines(keepends=True)[:2]))
+
+    _run(records, output, "--resume")
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(r["id"] for r in rows) == [r["id"] for r in RECORDS]
+    assert [r["id"] for r in rows if "error" in r] == ["2"]
+
+
+def test_resume_retry_errors(records):
+    output = records / "out.jsonl"
+    _run(records, output)
+    with open(records / "in.jsonl", "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(dict(r, date="1972-12-01") if r["id"] == "2" else r) + "\n" for r in RECORDS)
+
+    _run(records, output, "--resume", "--retry-errors")
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(r["id"] for r in rows) == [r["id"] for r in RECORDS]
+    assert not any("error" in r for r in rows)
+
+
+def _parquet_ids(output, prefix):
+    pq = pytest.importorskip("pyarrow.parquet")
+    ids = []
+    for name in sorted(os.listdir(output)):
+        if name.startswith(prefix + "-"):
+            ids += pq.read_table(output / name, columns=["id"]).column("id").to_pylist()
+    return collections.Counter(ids)
+
+
+def test_resume_truncated_parquet_part(records):
+    pytest.importorskip("pyarrow")
+    output = records / "pq"
+    _run(records, output, "--format", "parquet")
+    last = max(name for name in os.listdir(output) if name.startswith("pulse-"))
+    # Crash while writing the last part (before its checkpoint entries)
+    path = output / last
+    path.write_bytes(path.read_bytes()[:100])
+    checkpoint = records / "pq.checkpoint"
+    part_ids = {r["id"] for r in RECORDS} - set(checkpoint.read_text().splitlines()[:2])
+    checkpoint.write_text("".join(line + "\n" for line in checkpoint.read_text().splitlines()
+                                  if line not in part_ids))
+
+    _run(records, output, "--format", "parquet", "--resume")
+    pulse = _parquet_ids(output, "pulse")
+    assert pulse.keys() == {r["id"] for r in RECORDS} - {"2"}
+    assert len(set(pulse.values())) == 1  # same sample count per chart: nothing written twice
+    assert _parquet_ids(output, "errors") == {"2": 1}
+    assert not [name for name in os.listdir(output) if name.endswith(".tmp")]
@@ -0,0 +1,87 @@
+"""Root-finding mode (method="roots") against the hourly scan."""
+import datetime
+
+import numpy as np
+import pytest
+
+import engine
+
+BIRTH_UTC = datetime.datetime(1988, 10, 18, 7, 25, tzinfo=datetime.timezone.utc)
+ASPECTS = list(engine.ASPECT_ANGLES)
+ORB = 2.0
+HOUR_NS = 3_600_000_000_000
+
+
+@pytest.fixture(scope="module")
+def natal():
+    return engine.calculate_natal_chart(BIRTH_UTC, 55.75, 37.61)
+
+
+def _by_key(table):
+    rows = {}
+    for i in np.argsort(table.start, kind="stable"):
+        key = (int(table.transiting[i]), int(table.natal[i]), int(table.aspect[i]))
+        rows.setdefault(key, []).append(i)
+    return rows
+
+
+@pytest.mark.parametrize("planets, days", [
+    (engine.ALL_PLANETS, 60),
+    ([p for p in engine.ALL_PLANETS if p[1] in engine.LIFETIME_PLANETS], 730),
+])
+def test_roots_match_scan(natal, planets, days):
+    start = datetime.date(2026, 1, 1)
+    end = start + datetime.timedelta(days=days)
+    args = (natal.positions, planets, ASPECTS, ORB, natal.cusps)
+    scan = engine.calculate_transit_table(start, end, 1, *args, method="scan")
+    roots = engine.calculate_transit_table(start, end, 1, *args, method="roots")
+
+    scan_rows, root_rows = _by_key(scan), _by_key(roots)
+    assert scan_rows.keys() == root_rows.keys()
+    for key, rows in scan_rows.items():
+        assert len(rows) == len(root_rows[key]), key
+        for i, j in zip(rows, root_rows[key]):
+            # The scan snaps edges to the next hourly sample inside / outside the orb
+            assert 0 <= scan.start[i] - roots.start[j] < HOUR_NS, key
+            assert 0 <= scan.end[i] - roots.end[j] < HOUR_NS, key
+
+
+def test_roots_exact_is_exact(natal):
+    start = datetime.date(2026, 1, 1)
+    end = start + datetime.timedelta(days=60)
+    roots = engine.calculate_transit_table(start, end, 1, natal.positions, engine.ALL_PLANETS, ASPECTS, ORB,
+                                           natal.cusps, method="roots")
+    hit = roots.exact != engine.NAT_NS
+    assert hit.any()
+    assert ((roots.exact[hit] >= roots.start[hit]) & (roots.exact[hit] <= roots.end[hit])).all()
+    # Within the hourly step of the scan: the orb at the exact time is (almost) zero
+    jds = engine.JD_UNIX_EPOCH + roots.exact[hit] / 86_400e9
+    for jd, t, n, a in zip(jds, roots.transiting[hit], roots.natal[hit], roots.aspect[hit]):
+        lon, _ = engine.get_planet_state(jd, engine.PLANET_IDS[engine.POINT_NAMES[t]])
+        orb, _ = engine.orb_and_rate(lon, 0.0, natal.positions[engine.PLANET_IDS[engine.POINT_NAMES[n]]],
+                                     engine.ASPECT_ANGLES[engine.ASPECT_NAMES[a]])
+        assert orb < 1e-3
+
+
+def test_reversed_window_is_empty(natal):
+    args = (natal.positions, engine.ALL_PLANETS, ASPECTS, ORB, natal.cusps)
+    for method in ("scan", "roots", "index"):
+        table = engine.calculate_transit_table(datetime.date(2026, 2, 1), datetime.date(2026, 1, 1), 1, *args,
+                                               method=method)
+        assert len(table) == 0, method
+    pulse_idx, pulse = engine.calculate_pulse(table, natal.positions, ORB, datetime.date(2026, 2, 1),
+                                              datetime.date(2026, 1, 1), sampling="adaptive")
+    assert len(pulse_idx) == len(pulse) == 0
+
+
+def test_roots_pulse_without_hourly_cache(natal):
+    # A window no other test scans: the pulse interpolates from the sky index, then from the cache
+    start, end = datetime.date(2032, 3, 1), datetime.date(2032, 3, 31)
+    roots = engine.calculate_transit_table(start, end, 1, natal.positions, engine.ALL_PLANETS, ASPECTS, ORB,
+                                           natal.cusps, method="roots")
+    misses = engine.get_cache().misses
+    _, pulse = engine.calculate_pulse(roots, natal.positions, ORB, start, end)
+    assert engine.get_cache().misses == misses
+    engine.calculate_transit_table(start, end, 1, natal.positions, engine.ALL_PLANETS, ASPECTS, ORB, natal.cusps)
+    _, cached = engine.calculate_pulse(roots, natal.positions, ORB, start, end)
+    np.testing.assert_allclose(pulse, cached, rtol=1e-4, atol=1e-3 * np.abs(cached).max())
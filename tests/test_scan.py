@@ -0,0 +1,44 @@
+"""Scan variants that must reproduce the serial hourly scan exactly."""
+import datetime
+
+import pandas as pd
+import pytest
+
+import engine
+from transit_cache import TransitCache
+
+BIRTH_UTC = datetime.datetime(1988, 10, 18, 7, 25, tzinfo=datetime.timezone.utc)
+ASPECTS = list(engine.ASPECT_ANGLES)
+ORB = 2.0
+START = datetime.date(2027, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def natal():
+    return engine.calculate_natal_chart(BIRTH_UTC, 55.75, 37.61, engine.ALL_PLANETS + engine.ANGLES)
+
+
+def _serial(natal, start, end, natal_points=None):
+    return engine.calculate_transits(start, end, 1, natal.positions, engine.ALL_PLANETS, ASPECTS, ORB, natal.cusps,
+                                     natal_points=natal_points)
+
+
+def test_parallel_shards_match_serial(natal):
+    end = START + datetime.timedelta(days=4 * engine.SCAN_SHARD_MIN_DAYS)
+    table = engine.parallel_transit_table(START, end, 1, natal.positions, engine.ALL_PLANETS, ASPECTS, ORB,
+                                          natal.cusps, workers=2)
+    # Four shards: rows open at a shard edge have to be stitched back into one
+    pd.testing.assert_frame_equal(table.to_frame(), _serial(natal, START, end))
+
+
+def test_transit_cache_matches_scan(natal):
+    cache = TransitCache()
+    points = engine.ALL_PLANETS + engine.ANGLES
+    first = (START, START + datetime.timedelta(days=45))
+    # Overlaps the first window: cached and newly scanned segments in one answer
+    second = (START + datetime.timedelta(days=20), START + datetime.timedelta(days=80))
+    for start, end in (first, second, first):
+        got = cache.calculate_transits(start, end, 1, natal.positions, engine.ALL_PLANETS, ASPECTS, ORB,
+                                       natal.cusps, natal_points=points)
+        pd.testing.assert_frame_equal(got, _serial(natal, start, end, natal_points=points))
+    assert cache.covers(*first, 1, natal.positions, engine.ALL_PLANETS, ASPECTS, ORB, natal_points=points)
@@ -0,0 +1,241 @@
+"""
+Incremental transit cache.
+
+st.cache_data over calculate_transits keys on the whole argument list, so one more
+day, one more aspect or a moved orb slider recomputes everything. This cache keeps
+results per (transiting body, natal longitude, aspect angle) and per time segment of
+the scan grid instead:
+    entry = samples of the segment where the aspect deviation is within CACHE_ORB
+            (sample offsets, deviation, transit longitude)
+A request only computes the segments/combinations it does not have yet; a narrower
+orb is a filter on the stored deviations. Natal houses are applied on assembly, so
+the house system is not part of the key either.
+
+Configuration (environment):
+    ASTROPULSE_TRANSIT_CACHE_MB  - memory bound in MB (default 64), LRU eviction
+"""
+import datetime
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import engine
+import metrics
+from ephemeris_cache import GRID_ORIGIN_JD
+
+SEGMENT_SAMPLES = 720   # scan samples per cached segment (30 days at 1h)
+CACHE_ORB = 5.0         # deviations are stored up to max(orb, CACHE_ORB) - the UI orb slider maximum
+
+
+class _Entry:
+    __slots__ = ("orb", "offsets", "dev", "lon", "nbytes")
+
+    def __init__(self, orb, offsets, dev, lon):
+        self.orb, self.offsets, self.dev, self.lon = orb, offsets, dev, lon
+        self.nbytes = offsets.nbytes + dev.nbytes + lon.nbytes + 64
+
+
+class TransitCache:
+    """LRU of (step, segment, body, natal lon, angle) -> in-orb samples, bounded by bytes."""
+
+    def __init__(self, max_bytes: int = 64 * 2**20):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # -- grid --
+    @staticmethod
+    def _grid(start_date, end_date, hour_increment):
+        """Window on the global scan grid: (start_dt, end_dt, delta, g0, n_steps) or None if off-grid."""
+        start_dt = datetime.datetime.combine(start_date, datetime.time(0, 0), tzinfo=pytz.UTC)
+        end_dt = datetime.datetime.combine(end_date, datetime.time(23, 59), tzinfo=pytz.UTC)
+        delta = datetime.timedelta(hours=hour_increment)
+        n_steps = int((end_dt - start_dt) / delta) + 1
+        g = (engine.datetime_to_jd(start_dt) - GRID_ORIGIN_JD) * 24.0 / hour_increment
+        if abs(g - round(g)) > 1e-6:
+            return None
+        return start_dt, end_dt, delta, int(round(g)), n_steps
+
+    @staticmethod
+    def _keys(natal_positions, chosen_planets, chosen_aspect_names, natal_points=None):
+        """(ti, ni, ai, body, natal lon, angle) for every scanned combination."""
+        t_ids = [pid for pid, _ in chosen_planets]
+        n_ids = [pid for pid, _ in (chosen_planets if natal_points is None else natal_points)]
+        return [(ti, ni, ai, t, natal_positions[n], float(engine.ASPECT_ANGLES[a]))
+                for ti, t in enumerate(t_ids) for ni, n in enumerate(n_ids) if t != n
+                for ai, a in enumerate(chosen_aspect_names)]
+
+    # -- entries --
+    def _fill(self, hour_increment, seg, missing, orb):
+        """Computes one segment for the missing (body, natal lon, angle) combinations."""
+        bodies = sorted({k[0] for k in missing})
+        g = seg * SEGMENT_SAMPLES + np.arange(SEGMENT_SAMPLES)
+        t_lon, _ = engine.get_planet_positions(GRID_ORIGIN_JD + g * (hour_increment / 24.0), bodies)
+        store_orb = max(orb, CACHE_ORB)
+        col = {b: j for j, b in enumerate(bodies)}
+        filled = {}
+        for body, natal_lon, angle in missing:
+            lon = t_lon[:, col[body]]
+            # Same arithmetic as engine.aspect_tensor, so thresholds agree bit for bit
+            dev = np.abs(engine.angle_diff_array(lon, natal_lon) - angle)
+            sel = np.nonzero(dev <= store_orb)[0]
+            filled[body, natal_lon, angle] = _Entry(store_orb, sel.astype(np.int32), dev[sel], lon[sel])
+        with self._lock:
+            for k, entry in filled.items():
+                key = (hour_increment, seg) + k
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self.nbytes -= old.nbytes
+                self._entries[key] = entry
+                self.nbytes += entry.nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self.nbytes -= old.nbytes
+                self.evictions += 1
+        return filled
+
+    def _segments(self, hour_increment, seg0, seg1, combos, orb):
+        """{seg: {(body, natal lon, angle): entry}} for seg0..seg1, computing what is missing."""
+        result = {}
+        for seg in range(seg0, seg1 + 1):
+            found, missing = {}, []
+            with self._lock:
+                for k in combos:
+                    entry = self._entries.get((hour_increment, seg) + k)
+                    if entry is not None and entry.orb >= orb:
+                        self._entries.move_to_end((hour_increment, seg) + k)
+                        found[k] = entry
+                        self.hits += 1
+                    else:
+                        missing.append(k)
+                        self.misses += 1
+            if missing:
+                found.update(self._fill(hour_increment, seg, missing, orb))
+            result[seg] = found
+        return result
+
+    def covers(self, start_date, end_date, hour_increment, natal_positions, chosen_planets,
+               chosen_aspect_names, orb, natal_points=None) -> bool:
+        """True if the request can be answered without computing anything."""
+        grid = self._grid(start_date, end_date, hour_increment)
+        if grid is None:
+            return False
+        _, _, _, g0, n_steps = grid
+        combos = {k[3:] for k in self._keys(natal_positions, chosen_planets, chosen_aspect_names, natal_points)}
+        with self._lock:
+            for seg in range(g0 // SEGMENT_SAMPLES, (g0 + n_steps - 1) // SEGMENT_SAMPLES + 1):
+                for k in combos:
+                    entry = self._entries.get((hour_increment, seg) + k)
+                    if entry is None or entry.orb < orb:
+                        return False
+        return True
+
+    # -- transits --
+    def calculate_transits(self, start_date: datetime.date, end_date: datetime.date, hour_increment: float,
+                           natal_positions: Dict[int, float], chosen_planets: Sequence[Tuple[int, str]],
+                           chosen_aspect_names: Sequence[str], orb: float,
+                           natal_cusps: Sequence[float],
+                           natal_points: Optional[Sequence[Tuple[int, str]]] = None) -> pd.DataFrame:
+        """Same result as engine.calculate_transits(method="scan"), assembled from cached segments."""
+        return self.calculate_transit_table(start_date, end_date, hour_increment, natal_positions, chosen_planets,
+                                            chosen_aspect_names, orb, natal_cusps, natal_points).to_frame()
+
+    @metrics.timed("transit_cache")
+    def calculate_transit_table(self, start_date: datetime.date, end_date: datetime.date, hour_increment: float,
+                                natal_positions: Dict[int, float], chosen_planets: Sequence[Tuple[int, str]],
+                                chosen_aspect_names: Sequence[str], orb: float,
+                                natal_cusps: Sequence[float],
+                                natal_points: Optional[Sequence[Tuple[int, str]]] = None) -> "engine.IntervalTable":
+        """IntervalTable form of calculate_transits."""
+        engine._check_transiting(chosen_planets)
+        grid = self._grid(start_date, end_date, hour_increment)
+        if grid is None:
+            return engine.calculate_transit_table(start_date, end_date, hour_increment, natal_positions,
+                                                  chosen_planets, chosen_aspect_names, orb, natal_cusps,
+                                                  natal_points=natal_points)
+        start_dt, end_dt, delta, g0, n_steps = grid
+        g_end = g0 + n_steps
+        seg0, seg1 = g0 // SEGMENT_SAMPLES, (g_end - 1) // SEGMENT_SAMPLES
+
+        keys = self._keys(natal_positions, chosen_planets, chosen_aspect_names, natal_points)
+        segments = self._segments(hour_increment, seg0, seg1, sorted({k[3:] for k in keys}), orb)
+
+        n_a = len(chosen_aspect_names)
+        house_index = engine.get_house_index(natal_cusps)
+        t_codes = [engine.point_code(name) for _, name in chosen_planets]
+        n_codes = [engine.point_code(name) for _, name in (chosen_planets if natal_points is None else natal_points)]
+        a_codes = [engine.aspect_code(a) for a in chosen_aspect_names]
+        start_ns, end_ns = engine._dt_ns(start_dt), engine._dt_ns(end_dt)
+        delta_ns = delta // datetime.timedelta(microseconds=1) * 1000
+        rows = engine.IntervalBuilder()
+        claimed = {}  # (ti, ni) -> samples taken by an earlier aspect (first match wins, as in aspect_tensor)
+        for ti, ni, ai, body, natal_lon, angle in keys:
+            parts_g, parts_lon = [], []
+            for seg in range(seg0, seg1 + 1):
+                entry = segments[seg][body, natal_lon, angle]
+                if not len(entry.offsets):
+                    continue
+                g = seg * SEGMENT_SAMPLES + entry.offsets.astype(np.int64)
+                sel = entry.dev <= orb
+                if seg in (seg0, seg1):
+                    sel &= (g >= g0) & (g < g_end)
+                parts_g.append(g[sel])
+                parts_lon.append(entry.lon[sel])
+            if not parts_g:
+                continue
+            g = np.concatenate(parts_g)
+            if not len(g):
+                continue
+            lon = np.concatenate(parts_lon)
+            if ai and (ti, ni) in claimed:
+                keep = ~np.isin(g, claimed[ti, ni])
+                g, lon = g[keep], lon[keep]
+                if not len(g):
+                    continue
+            if n_a > 1:
+                claimed[ti, ni] = np.union1d(claimed.get((ti, ni), g[:0]), g)
+
+            n_house = int(house_index.house_of(natal_lon)) if house_index else 0
+            t_houses = house_index.houses_of(lon) if house_index else None
+            breaks = np.nonzero(np.diff(g) != 1)[0] + 1
+            for r0, r1 in zip(np.r_[0, breaks], np.r_[breaks, len(g)]):
+                houses = []
+                if t_houses is not None:
+                    engine._append_houses(houses, t_houses[r0:r1])
+                last = g[r1 - 1] + 1
+                rows.append(t_codes[ti], n_codes[ni], a_codes[ai], start_ns + int(g[r0] - g0) * delta_ns,
+                            start_ns + int(last - g0) * delta_ns if last < g_end else end_ns, houses, n_house)
+        return rows.build().sorted()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._entries), "bytes": self.nbytes, "max_bytes": self.max_bytes}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_transit_cache() -> TransitCache:
+    """Process-wide transit cache (configured from the environment on first use)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TransitCache(int(float(os.environ.get("ASTROPULSE_TRANSIT_CACHE_MB", 64)) * 2**20))
+    return _cache